@@ -0,0 +1,150 @@
+"""Shared Azure DevOps plumbing for the test-plan scripts (test_case_burndown.py,
+test_cases_by_top_suite_patched3.py): the pooled/cached session, the worker pool, paged
+GETs and the suite-tree helpers. Reads ADO_PAT and the tuning knobs from .env."""
+import base64
+from typing import Dict, Any, Callable, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import dotenv_values
+from ado_json import jload
+try:
+    import ijson  # optional: streams large result pages (see get_json_paginated_fallback)
+except ImportError:
+    ijson = None
+
+cfg = dotenv_values(".env")
+
+# Shared worker pool for the independent per-suite / per-run GETs (I/O-bound, so threads overlap
+# the round trips). ADO_CONCURRENCY in .env tunes it; keep it modest to stay under ADO throttling.
+CONCURRENCY = int(cfg.get("ADO_CONCURRENCY") or 10)
+EXECUTOR = ThreadPoolExecutor(max_workers=CONCURRENCY)
+
+def fetch_all(fn: Callable[[Any], Any], args, label: str) -> List[Any]:
+    """fn(arg) for every arg on EXECUTOR, results in input order. Every call is allowed to
+    finish; if any gave up (get_json* raise SystemExit on HTTP errors) the failures are
+    listed and the script stops, rather than writing a report with rows missing."""
+    failed: List[Any] = []
+    def run(arg):
+        try:
+            return fn(arg)
+        except SystemExit as e:
+            print(f"[ERROR] {label} {arg}: {e}")
+            failed.append(arg)
+            return None
+    results = list(EXECUTOR.map(run, args))
+    if failed:
+        raise SystemExit(f"{len(failed)} {label} call(s) failed: {', '.join(map(str, failed))}")
+    return results
+
+# Basic-auth header is fixed for the run; build it once instead of re-encoding the PAT per request.
+HEADERS = {
+    "Authorization": "Basic " + base64.b64encode(f":{(cfg.get('ADO_PAT') or '').strip()}".encode()).decode(),
+    "Accept": "application/json",
+}
+
+# One pooled keep-alive session for every GET (the pool above shares it), with retry/backoff
+# on throttling (429) and transient 5xx. raise_on_status=False hands the final response back
+# so the status checks below still report the body.
+# ADO_CACHE_SECONDS (in .env) serves repeat GETs from a local SQLite cache (requires requests-cache),
+# for iterating on the report without re-pulling the plan; ADO_CACHE=0 switches it off again.
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+_cache_seconds = (cfg.get("ADO_CACHE_SECONDS") or "").strip()
+if _cache_seconds and CachedSession is not None and (cfg.get("ADO_CACHE") or "1").strip() != "0":
+    SESSION = CachedSession("ado_cache", backend="sqlite", expire_after=int(_cache_seconds),
+                            allowable_methods=["GET"], stale_if_error=True)
+    SESSION.cache.delete(expired=True)
+else:
+    SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32, pool_maxsize=64,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"], raise_on_status=False),
+))
+SESSION.headers.update(HEADERS)
+HTTP_TIMEOUT = (5, 60)  # (connect, read) seconds
+
+def get_json_paginated_fallback(url: str, versions: List[str], params: Optional[Dict[str, Any]] = None,
+                                value_key: str = "value", stream: bool = False) -> List[Dict[str, Any]]:
+    """stream=True parses each page item-by-item off the socket (needs ijson) instead of
+    buffering the whole body and its parsed dict; meant for the large run-results pages.
+    Skipped when the requests-cache session is active, since it reads the body to store it."""
+    last = ""
+    for ver in versions:
+        out: List[Dict[str, Any]] = []
+        token: Optional[str] = None
+        while True:
+            q = dict(params or {})
+            q["api-version"] = ver
+            if token:
+                q["continuationToken"] = token
+            with SESSION.get(url, params=q, timeout=HTTP_TIMEOUT, stream=stream) as r:
+                print(f"GET {r.url}")
+                if r.status_code >= 400:
+                    last = f"{r.status_code} {r.text}"
+                    out = []
+                    break
+                if stream and ijson is not None and not hasattr(SESSION, "cache"):
+                    r.raw.decode_content = True
+                    out.extend(ijson.items(r.raw, f"{value_key}.item", use_float=True))
+                else:
+                    body = jload(r)
+                    chunk = body.get(value_key, body if isinstance(body, list) else [])
+                    out.extend(chunk if isinstance(chunk, list) else [chunk])
+                token = r.headers.get("x-ms-continuationtoken")
+            if not token:
+                return out
+    raise SystemExit(f"All versions failed for {url}\n{last}")
+
+# ---------- Suite tree ----------
+def build_top_lookup(suites: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Return dict of suiteId -> top-level suiteId. Each parent chain is walked once:
+    every node on the way up is pointed straight at its root (path compression)."""
+    by_id = {s["id"]: s for s in suites}
+    top_of: Dict[str, str] = {}
+    for s in suites:
+        stack = []
+        cur = s["id"]
+        while cur not in top_of and by_id[cur].get("parentId") is not None:
+            stack.append(cur)
+            cur = by_id[cur]["parentId"]
+        root = top_of.get(cur, cur)
+        top_of[cur] = root
+        for n in stack:
+            top_of[n] = root
+    return top_of
+
+def point_suite_id(p: Dict[str, Any]) -> Optional[str]:
+    sid = (p.get("suite") or p.get("testSuite") or {}).get("id")
+    return str(sid) if sid is not None else None
+
+def points_by_suite(plan_id: str, suites: List[Dict[str, Any]],
+                    get_points: Callable[..., List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Return dict of suiteId -> that suite's own points, using one recursive
+    get_points(plan_id, suite_id, recursive=True) call per top-level suite. A top whose
+    response has no child-suite points despite having children (flag ignored/unsupported)
+    is re-fetched per suite."""
+    top_of = build_top_lookup(suites)
+    members: Dict[str, List[str]] = {}
+    for s in suites:
+        members.setdefault(top_of[s["id"]], []).append(s["id"])
+    out: Dict[str, List[Dict[str, Any]]] = {s["id"]: [] for s in suites}
+    tops = list(members)
+    legacy: List[str] = []
+    for tid, pts in zip(tops, fetch_all(lambda t: get_points(plan_id, t, recursive=True), tops,
+                                        "recursive points for suite")):
+        origins = [point_suite_id(p) for p in pts]
+        if len(members[tid]) > 1 and all(o in (None, tid) for o in origins):
+            legacy.extend(members[tid])
+            continue
+        for p, o in zip(pts, origins):
+            out.get(o, out[tid]).append(p)
+    if legacy:
+        print(f"[i] Recursive points not honoured; falling back to {len(legacy)} per-suite call(s)")
+        for sid, pts in zip(legacy, fetch_all(lambda s: get_points(plan_id, s), legacy, "points for suite")):
+            out[sid] = pts
+    return out
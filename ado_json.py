@@ -0,0 +1,11 @@
+"""Response-body decoding shared by the ADO scripts: orjson when it is installed, stdlib json otherwise."""
+from typing import Any
+import requests
+try:
+    import orjson
+
+    def jload(resp: requests.Response) -> Any:
+        return orjson.loads(resp.content)
+except ImportError:
+    def jload(resp: requests.Response) -> Any:
+        return resp.json()
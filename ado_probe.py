@@ -1,6 +1,8 @@
 
 #!/usr/bin/env python3
 import os, base64, requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import quote
 from dotenv import load_dotenv
 from pathlib import Path
@@ -14,6 +16,12 @@ PROJECT_ID = os.environ.get("PROJECT_ID","")  # optional if you know it
 BASE = f"https://dev.azure.com/{ORG}".rstrip("/")
 ENC = quote(PROJECT, safe="")
 
+# Reuse one TLS connection across the probes; retry throttling/transient 5xx on GETs
+SESSION = requests.Session()
+SESSION.headers.update({"Accept": "application/json"})
+_retry = Retry(total=5, backoff_factor=0.4, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_retry))
+
 def h_basic_header():
     tok = base64.b64encode(f":{PAT}".encode()).decode()
     return {"Authorization": f"Basic {tok}", "Accept":"application/json"}
@@ -23,7 +31,7 @@ def style_requests_auth():
 
 def ping(desc, url, params=None, headers=None, auth=None):
     print(f"\n=== {desc} ===")
-    r = requests.get(url, params=params, headers=headers, auth=auth)
+    r = SESSION.get(url, params=params, headers=headers, auth=auth)
     print("GET", r.url)
     print("→", r.status_code)
     print(r.text[:200], "..." if len(r.text)>200 else "")
@@ -1,30 +1,88 @@
 import pandas as pd
 import requests
-from dotenv import dotenv_values
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime, timedelta
 import os
 
-env = dotenv_values(".env")  # fallback source
-
-def get_env(key):
-    return os.getenv(key, env.get(key))
-# Load environment variables
-#env = dotenv_values(".env")
-org = get_env("ADO_ORG")
-project = get_env("ADO_PROJECT")
-pat_token = get_env("ADO_PAT")
-plan_name = get_env("TEST_PLAN_NAME")
-plan_id = get_env("TEST_PLAN_ID")
-suite_name = get_env("TEST_SUITE_NAME")
-parent_suite_id = get_env("TEST_SUITE_ID")
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for ado_json
+from ado_json import jload
+
+# Load .env once into the process environment; variables already set in the environment win
+load_dotenv(".env")
+
+required_keys = ["ADO_ORG", "ADO_PROJECT", "ADO_PAT", "TEST_PLAN_ID", "TEST_SUITE_ID", "START_DATE", "END_DATE"]
+missing = [key for key in required_keys if not os.getenv(key)]
+if missing:
+    raise SystemExit(f"Missing required .env values: {', '.join(missing)}")
+
+org = os.environ["ADO_ORG"]
+project = os.environ["ADO_PROJECT"]
+pat_token = os.environ["ADO_PAT"]
+plan_name = os.getenv("TEST_PLAN_NAME")
+plan_id = os.environ["TEST_PLAN_ID"]
+suite_name = os.getenv("TEST_SUITE_NAME")
+parent_suite_id = os.environ["TEST_SUITE_ID"]
+start_date_str = os.environ["START_DATE"]
+end_date_str = os.environ["END_DATE"]
 
 org_url = f"https://dev.azure.com/{org}"
 encoded_project = quote(project)
 auth = requests.auth.HTTPBasicAuth("", pat_token)
 headers = {"Content-Type": "application/json"}
 
+# One keep-alive session shared by every ADO call (and by the worker threads below).
+# Throttled (429) and transient 5xx GETs are retried with backoff instead of failing the run.
+# Setting ADO_CACHE_SECONDS in .env serves unchanged GETs from a local SQLite cache
+# (requires requests-cache), which makes repeated development runs cheap.
+cache_seconds = os.getenv("ADO_CACHE_SECONDS")
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+if cache_seconds and CachedSession is not None:
+    session = CachedSession("ado_cache", backend="sqlite", expire_after=int(cache_seconds),
+                            allowable_methods=["GET"], stale_if_error=True)
+else:
+    session = requests.Session()
+session.auth = auth
+session.headers.update(headers)
+session.headers.update({"Accept": "application/json"})
+retry = Retry(total=5, backoff_factor=0.4, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry))
+
+@lru_cache(maxsize=None)
+def get_child_suites(plan_id, parent_suite_id):
+    """Direct children of one suite, expanded server-side instead of listing every suite in the plan.
+
+    Fetched once and shared by the child/descendant lookups below.
+    """
+    url = f"{org_url}/{encoded_project}/_apis/testplan/Plans/{plan_id}/suites/{parent_suite_id}"
+    response = session.get(url, params={"expand": "children", "api-version": "6.0-preview.1"})
+    response.raise_for_status()
+    return jload(response).get("children") or []
+
+def get_paged_values(url, params):
+    """Collect `value` across every page, following ADO's x-ms-continuationtoken header."""
+    params = dict(params)
+    values = []
+    while True:
+        response = session.get(url, params=params)
+        response.raise_for_status()
+        values.extend(jload(response).get("value", []))
+        token = response.headers.get("x-ms-continuationtoken")
+        if not token:
+            return values
+        params["continuationToken"] = token
+
 def get_child_suites_by_filter(plan_id, parent_suite_id):
-    url = f"{org_url}/{encoded_project}/_apis/test/plans/{plan_id}/suites?api-version=6.0"
+    url = f"{org_url}/{encoded_project}/_apis/testplan/Plans/{plan_id}/suites/{parent_suite_id}?expand=children"
     print("🔍 DEBUG ENV VALUES")
     print(f"org_url: {org_url!r}")
     print(f"encoded_project: {encoded_project!r}")
@@ -32,241 +90,236 @@ def get_child_suites_by_filter(plan_id, parent_suite_id):
     print(f"parent_suite_id: {parent_suite_id!r}")
     print(f"url: {url}")
 
-    response = requests.get(url, headers=headers, auth=auth)
-    response.raise_for_status()
-    suites = response.json().get("value", [])
-    return [s for s in suites if str(s.get("parentSuite", {}).get("id")) == str(parent_suite_id)]
+    return get_child_suites(plan_id, parent_suite_id)
 
 def get_all_test_runs(plan_id):
-    url = f"{org_url}/{encoded_project}/_apis/test/runs?planId={plan_id}&includeRunDetails=true&api-version=6.0"
-    response = requests.get(url, headers=headers, auth=auth)
-    response.raise_for_status()
-    return response.json()["value"]
+    url = f"{org_url}/{encoded_project}/_apis/test/runs"
+    if not (start_date_str and end_date_str):
+        return get_paged_values(url, {"planId": plan_id, "includeRunDetails": "true", "api-version": "6.0"})
+    # Let the server drop runs last updated before the reporting window. The date-range form
+    # needs both bounds at most 7 days apart and filters by planIds (it ignores planId), so walk
+    # START_DATE..tomorrow in 7-day slices; the upper end is today, not END_DATE, because a run
+    # with results inside the window may have been updated since. main() still filters by day.
+    runs = {}
+    lo = datetime.strptime(start_date_str, "%Y-%m-%d")
+    stop = datetime.now() + timedelta(days=1)
+    while lo < stop:
+        hi = min(lo + timedelta(days=7), stop)
+        params = {
+            "planIds": plan_id, "includeRunDetails": "true", "api-version": "6.0",
+            "minLastUpdatedDate": lo.strftime("%Y-%m-%dT%H:%M:%S"),
+            "maxLastUpdatedDate": hi.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        for run in get_paged_values(url, params):
+            runs.setdefault(run["id"], run)  # slices share their boundary instant
+        lo = hi
+    return list(runs.values())
 
 def get_test_results_for_run(run_id):
-    url = f"{org_url}/{encoded_project}/_apis/test/runs/{run_id}/results?api-version=6.0"
-    response = requests.get(url, headers=headers, auth=auth)
-    response.raise_for_status()
-    return response.json()["value"]
-
-if __name__ == "__main__":
-    child_suites = get_child_suites_by_filter(plan_id, parent_suite_id)
-    df = pd.DataFrame([{"id": suite["id"], "name": suite["name"]} for suite in child_suites])
-    print(df)
-
-#### Gather the test cases inside each child suite #####
-#### and place them into a dataframe #####
+    url = f"{org_url}/{encoded_project}/_apis/test/runs/{run_id}/results"
+    return get_paged_values(url, {"api-version": "6.0"})
 
 def get_test_cases(plan_id, suite_id):
-    url = f"{org_url}/{encoded_project}/_apis/testplan/Plans/{plan_id}/suites/{suite_id}/testcases?api-version=6.0-preview.2"
-    response = requests.get(url, headers=headers, auth=auth)
+    url = f"{org_url}/{encoded_project}/_apis/testplan/Plans/{plan_id}/suites/{suite_id}/testcases"
+    response = session.get(url, params={"api-version": "6.0-preview.2"})
     response.raise_for_status()
-    return response.json()["value"]
+    return jload(response)["value"]
 
 def get_test_cases_from_points(plan_id, suite_id):
-    url = f"{org_url}/{encoded_project}/_apis/test/plans/{plan_id}/suites/{suite_id}/points?api-version=7.1-preview.2"
-    response = requests.get(url, headers=headers, auth=auth)
-    response.raise_for_status()
-    return response.json()["value"]
+    url = f"{org_url}/{encoded_project}/_apis/test/plans/{plan_id}/suites/{suite_id}/points"
+    return get_paged_values(url, {"api-version": "7.1-preview.2"})
 
 def get_all_descendant_suite_ids(plan_id, parent_suite_id):
-    url = f"{org_url}/{encoded_project}/_apis/test/plans/{plan_id}/suites?api-version=6.0"
-    response = requests.get(url, headers=headers, auth=auth)
-    response.raise_for_status()
-    all_suites = response.json()["value"]
-    return [s["id"] for s in all_suites if str(s.get("parentSuite", {}).get("id")) == str(parent_suite_id)]
+    return [s["id"] for s in get_child_suites(plan_id, parent_suite_id)]
 
 def list_all_test_plans():
-    url = f"{org_url}/{encoded_project}/_apis/testplan/plans?api-version=6.0"
-    response = requests.get(url, headers=headers, auth=auth)
+    url = f"{org_url}/{encoded_project}/_apis/testplan/plans"
+    response = session.get(url, params={"api-version": "6.0"})
     response.raise_for_status()
-    plans = response.json()["value"]
+    plans = jload(response)["value"]
     for p in plans:
         print(f"ID: {p['id']}  |  Name: {p['name']}")
 
-list_all_test_plans()
+def get_work_item_titles(ids):
+    url = f"https://dev.azure.com/{org}/_apis/wit/workitems"
+    params = {"ids": ",".join(ids), "fields": "System.Title", "api-version": "6.0"}
+    response = session.get(url, params=params)
+    response.raise_for_status()
+    items = jload(response)["value"]
+    return {str(item["id"]): item["fields"]["System.Title"] for item in items}
 
-if __name__ == "__main__":
-    child_suite_ids = get_all_descendant_suite_ids(plan_id, parent_suite_id)
-    target_suite_ids = set(child_suite_ids + [int(parent_suite_id)])
+def get_all_work_item_titles(ids, batch_size=200):
+    """wit/workitems accepts at most 200 ids per call, so split and fetch the batches concurrently."""
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    titles = {}
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for batch_titles in pool.map(get_work_item_titles, batches):
+            titles.update(batch_titles)
+    return titles
 
-    # Collect all test cases
-test_cases_data = []
+def fetch_suite_points(suite):
+    try:
+        return get_test_cases_from_points(plan_id, suite["id"])
+    except requests.HTTPError as e:
+        print(f"Failed to get test points for suite {suite['id']}: {e}")
+        return []
 
-for suite in child_suites:
-    suite_id = suite["id"]
-    suite_name = suite["name"]
+def fetch_run_results(run):
+    run_id = run["id"]
+    print(f"Fetching results for run {run_id}... ({run['name']})")
     try:
-        points = get_test_cases_from_points(plan_id, suite_id)
-        for pt in points:
-            test_case = pt["testCase"]
-            test_cases_data.append({
-                "suite_id": suite_id,
-                "suite_name": suite_name,
-                "test_case_id": test_case["id"],
-                "test_case_name": test_case.get("name", ""),  # fallback if no title
-                "test_case_url": test_case["url"]
-            })
+        return get_test_results_for_run(run_id)
     except requests.HTTPError as e:
-        print(f"Failed to get test points for suite {suite_id}: {e}")
+        print(f"Error loading results for run {run_id}: {e}")
+        return []
 
-df = pd.DataFrame(test_cases_data)
+def to_local_day(date_strs):
+    """Parse ADO ISO timestamps in one vectorized pass and truncate to the (naive) America/New_York day."""
+    parsed = pd.to_datetime(pd.Series(date_strs, dtype="object"), utc=True, errors="coerce", cache=True)
+    return parsed.dt.tz_convert("America/New_York").dt.normalize().dt.tz_localize(None)
 
-def get_work_item_titles(ids):
-    ids_str = ",".join(ids)
-    url = f"https://dev.azure.com/{org}/_apis/wit/workitems?ids={ids_str}&fields=System.Title&api-version=6.0"
-    response = requests.get(url, headers=headers, auth=auth)
-    response.raise_for_status()
-    items = response.json()["value"]
-    return {str(item["id"]): item["fields"]["System.Title"] for item in items}
+def main():
+    # Plotting libraries are only needed once there is something to plot
+    import matplotlib.pyplot as plt
+    import numpy as np
 
-# Extract unique IDs
-unique_ids = list({str(row["test_case_id"]) for row in test_cases_data})
-titles_map = get_work_item_titles(unique_ids)
+    list_all_test_plans()
 
-# Add titles to DataFrame
-df["test_case_title"] = df["test_case_id"].astype(str).map(titles_map)
+    child_suites = get_child_suites_by_filter(plan_id, parent_suite_id)
+    print(pd.DataFrame({"id": [suite["id"] for suite in child_suites],
+                        "name": [suite["name"] for suite in child_suites]}))
 
-print(df)
+    child_suite_ids = get_all_descendant_suite_ids(plan_id, parent_suite_id)
+    # ADO may serialize suite ids as ints or strings; normalize to ints once
+    target_suite_ids = {int(sid) for sid in child_suite_ids} | {int(parent_suite_id)}
 
-##### Generate Burndown Chart #####
+    #### Gather the test cases inside each child suite #####
+    #### and place them into a dataframe #####
 
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+    # Suites are independent, so fetch their points concurrently; the test case table and
+    # the execution-date series below both read from this one fetch
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        points_by_suite = list(pool.map(fetch_suite_points, child_suites))
 
-# Parse env dates
-start_date = datetime.strptime(get_env("START_DATE"), "%Y-%m-%d")
-end_date = datetime.strptime(get_env("END_DATE"), "%Y-%m-%d")
+    # One list per column (no per-row dicts); the DataFrame is built straight from these
+    test_cases_data = {"suite_id": [], "suite_name": [], "test_case_id": [], "test_case_name": [], "test_case_url": []}
 
-# Build time series of execution dates
-execution_dates = []
+    for suite, points in zip(child_suites, points_by_suite):
+        for pt in points:
+            test_case = pt["testCase"]
+            test_cases_data["suite_id"].append(suite["id"])
+            test_cases_data["suite_name"].append(suite["name"])
+            test_cases_data["test_case_id"].append(test_case["id"])
+            test_cases_data["test_case_name"].append(test_case.get("name", ""))  # fallback if no title
+            test_cases_data["test_case_url"].append(test_case["url"])
 
-for suite in child_suites:
-    suite_id = suite["id"]
-    try:
-        
-        url = f"{org_url}/{encoded_project}/_apis/test/plans/{plan_id}/suites/{suite_id}/points?api-version=7.1-preview.2"
-        response = requests.get(url, headers=headers, auth=auth)
-        response.raise_for_status()
-        points = response.json()["value"]
+    df = pd.DataFrame(test_cases_data)
+    # Every point in a suite repeats its suite id/name; store them as categories
+    df["suite_id"] = df["suite_id"].astype("category")
+    df["suite_name"] = df["suite_name"].astype("category")
 
-        for pt in points:
-            exec_time = pt.get("lastResultDetails", {}).get("dateCompleted")
-            if exec_time:
-                exec_date = datetime.strptime(exec_time[:10], "%Y-%m-%d")
-                if start_date <= exec_date <= end_date:
-                    execution_dates.append(exec_date)
+    # Extract unique IDs
+    unique_ids = list({str(tc_id) for tc_id in test_cases_data["test_case_id"]})
+    titles_map = get_all_work_item_titles(unique_ids)
 
-    except requests.HTTPError as e:
-        print(f"Failed to fetch points for suite {suite_id}: {e}")
+    # Add titles to DataFrame
+    df["test_case_title"] = df["test_case_id"].astype(str).map(titles_map)
 
-# Count executions per day
-date_range = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
-counts = {d.date(): 0 for d in date_range}
-for d in execution_dates:
-    counts[d.date()] += 1
+    print(df)
 
-from collections import defaultdict
+    ##### Generate Burndown Chart #####
 
-execution_dates = []
-retest_dates = []
+    # Parse env dates
+    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
+    end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
 
-# Track executions by testCase ID
-execution_history = defaultdict(list)
+    # Build time series of execution dates (raw strings, parsed in one pass)
+    execution_dates = to_local_day([
+        pt["lastResultDetails"]["dateCompleted"]
+        for points in points_by_suite for pt in points
+        if (pt.get("lastResultDetails") or {}).get("dateCompleted")
+    ])
 
-test_runs = get_all_test_runs(plan_id)
-for run in test_runs:
-    run_id = run["id"]
-    print(f"Fetching results for run {run_id}... ({run['name']})")
-    try:
-        results = get_test_results_for_run(run_id)
+    # Count executions per day in the same pass that bins them (no re-scan of a datetime list)
+    date_range = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    per_day = execution_dates.value_counts()
+    counts = {d.date(): int(per_day.get(d, 0)) for d in date_range}
+
+    # Track executions by testCase ID
+    history_records = []  # (tc_id, raw date string, outcome)
+
+    # Runs are independent, so fetch their results concurrently over the shared session
+    test_runs = get_all_test_runs(plan_id)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results_by_run = list(pool.map(fetch_run_results, test_runs))
+
+    for results in results_by_run:
         for result in results:
             # Only include results from the selected test suite
-            suite_id = result.get("suite", {}).get("id")
-            if suite_id not in target_suite_ids:
+            suite_id = (result.get("suite") or {}).get("id")
+            if suite_id is None or int(suite_id) not in target_suite_ids:
                 continue
 
             tc_id = result["testCase"]["id"]
             outcome = result.get("outcome", "Unknown")
             date_str = result.get("startedDate") or result.get("completedDate")
             if date_str:
-                exec_date = datetime.strptime(date_str[:10], "%Y-%m-%d")
-                if start_date <= exec_date <= end_date:
-                    execution_history[tc_id].append((exec_date, outcome))
-
-    except requests.HTTPError as e:
-        print(f"Error loading results for run {run_id}: {e}")
+                history_records.append((tc_id, date_str, outcome))
+
+    history_df = pd.DataFrame(history_records, columns=["tc_id", "date", "outcome"])
+    history_df["date"] = to_local_day(history_df["date"])
+    history_df = history_df[(history_df["date"] >= start_date) & (history_df["date"] <= end_date)]
+
+    # Split out re-tests: a Passed result counts as a re-test when the same test case's
+    # previous result (chronologically; same-day ties ordered by outcome) was Failed
+    history_df = history_df.sort_values(["tc_id", "date", "outcome"])
+    prev_outcome = history_df.groupby("tc_id")["outcome"].shift()
+    retest_mask = (history_df["outcome"] == "Passed") & (prev_outcome == "Failed")
+    daily_executions = history_df.groupby("date").size()
+    daily_retests = history_df[retest_mask].groupby("date").size()
+
+    # Prepare full date range
+    dates = [d.date() for d in date_range]
+    executions = daily_executions.reindex(date_range, fill_value=0).tolist()
+    retests = daily_retests.reindex(date_range, fill_value=0).tolist()
+
+    # Plot
+    test_suite_name = suite_name
+    plt.figure(figsize=(10, 5))
+    plt.plot(dates, executions, marker='o', label="Total Executed")
+    plt.plot(dates, retests, marker='x', label="Re-tested After Bug")
+    plt.title("Test Case Execution Chart")
+    plt.suptitle(f"Test Plan: {plan_name} | Test Suite: {test_suite_name}", fontsize=10, y=0.96)
+    plt.xlabel("Date")
+    plt.ylabel("# of Test Cases")
+    plt.legend()
+    plt.grid(True)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    # plt.show()
+
+    # Prepare date-to-index mapping for regression
+    x_vals = np.arange(len(dates), dtype=np.float64)  # day indices
+    y_vals = np.asarray(executions, dtype=np.float64)
+
+    # Fit a simple linear model y = mx + b with the closed-form least-squares solution
+    # (a single day of data has no spread in x, so it projects flat)
+    x_mean, y_mean = x_vals.mean(), y_vals.mean()
+    x_var = ((x_vals - x_mean) ** 2).sum()
+    slope = ((x_vals - x_mean) * (y_vals - y_mean)).sum() / x_var if x_var else 0.0
+    intercept = y_mean - slope * x_mean
+
+    # Project next 5 days
+    projection_days = 5
+    future_x = np.arange(len(dates), len(dates) + projection_days)
+    future_dates = [dates[-1] + timedelta(days=i + 1) for i in range(projection_days)]
+    future_y = slope * future_x + intercept
+
+    # Plot trendline
+    plt.plot(future_dates, future_y, linestyle="--", color="gray", label="Projected Executed")
+
+    os.makedirs("charts", exist_ok=True)
+    plt.savefig("charts/" + test_suite_name + "_execution.jpg", format='jpg', bbox_inches="tight")
 
-# Split out re-tests
-daily_executions = defaultdict(int)
-daily_retests = defaultdict(int)
-
-for test_case_id, runs in execution_history.items():
-    # Ensure chronological order
-    runs.sort()
-    last_outcome = None
-    failure_date = None
-
-    for date, outcome in runs:
-        run_day = date.date()
-        daily_executions[run_day] += 1
-
-        if outcome == "Failed":
-            failure_date = run_day
-            last_outcome = "Failed"
-
-        elif outcome == "Passed":
-            # Register re-test only if the last result was a failure
-            if last_outcome == "Failed":
-                daily_retests[run_day] += 1
-                failure_date = None  # Reset after re-test
-            last_outcome = "Passed"
-
-        else:
-            last_outcome = outcome  # Track other transitions too
-
-# Prepare full date range
-date_range = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
-dates = [d.date() for d in date_range]
-executions = [daily_executions[d] for d in dates]
-retests = [daily_retests[d] for d in dates]
-
-# Plot
-test_suite_name = get_env("TEST_SUITE_NAME")
-plt.figure(figsize=(10, 5))
-plt.plot(dates, executions, marker='o', label="Total Executed")
-plt.plot(dates, retests, marker='x', label="Re-tested After Bug")
-plt.title("Test Case Execution Chart")
-plt.suptitle(f"Test Plan: {plan_name} | Test Suite: {test_suite_name}", fontsize=10, y=0.96)
-plt.xlabel("Date")
-plt.ylabel("# of Test Cases")
-plt.legend()
-plt.grid(True)
-plt.xticks(rotation=45)
-plt.tight_layout()
-# plt.show()
-
-import numpy as np
-
-# Prepare date-to-index mapping for regression
-x_vals = np.arange(len(dates))  # day indices
-y_vals = np.array(executions)
-
-# Fit a simple linear model: y = mx + b
-coeffs = np.polyfit(x_vals, y_vals, 1)
-trend_fn = np.poly1d(coeffs)
-
-# Project next 5 days
-projection_days = 5
-future_x = np.arange(len(dates), len(dates) + projection_days)
-future_dates = [dates[-1] + timedelta(days=i + 1) for i in range(projection_days)]
-future_y = trend_fn(future_x)
-
-# Plot trendline
-plt.plot(future_dates, future_y, linestyle="--", color="gray", label="Projected Executed")
-
-# Extend x-axis to fit projection
-dates += future_dates
-executions += [None] * projection_days  # Keep shape aligned for ticks
-
-plt.savefig("charts/" + test_suite_name + "_execution.jpg", format='jpg', bbox_inches="tight")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
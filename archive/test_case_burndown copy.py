@@ -1,9 +1,16 @@
 import os
+import re
 import requests
 import pandas as pd
 from dotenv import dotenv_values
 from urllib.parse import quote
 from dateutil.parser import parse
+from concurrent.futures import ThreadPoolExecutor
+
+from pathlib import Path
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for ado_json
+from ado_json import jload
 
 # Load environment variables
 env = dotenv_values(".env")
@@ -36,14 +43,67 @@ url = f"{org_url}/{encoded_project}/_apis/testplan/plans/{plan_id}?api-version=6
 auth = requests.auth.HTTPBasicAuth("", pat_token)
 headers = {"Content-Type": "application/json"}
 
+# One keep-alive session shared by every ADO call below.
+# Setting ADO_CACHE_SECONDS in .env serves unchanged GETs from a local SQLite cache
+# (requires requests-cache), which makes repeated development runs cheap.
+cache_seconds = env.get("ADO_CACHE_SECONDS")
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+if cache_seconds and CachedSession is not None:
+    session = CachedSession("ado_cache", backend="sqlite", expire_after=int(cache_seconds),
+                            allowable_methods=["GET"], stale_if_error=True)
+else:
+    session = requests.Session()
+session.auth = auth
+session.headers.update(headers)
+
+# Combined `value` lists keyed by URL, so repeated runs/results lookups hit ADO once per URL
+_json_cache = {}
+
+def get_values_cached(url):
+    """GET every page of `url` (following x-ms-continuationtoken) once per script run.
+
+    Returns the concatenated `value` list, or None if any page failed.
+    """
+    if url not in _json_cache:
+        values, params = [], {}
+        while True:
+            resp = session.get(url, params=params)
+            if not resp.ok:
+                values = None
+                break
+            values.extend(jload(resp).get("value", []))
+            token = resp.headers.get("x-ms-continuationtoken")
+            if not token:
+                break
+            params = {"continuationToken": token}
+        _json_cache[url] = values
+    return _json_cache[url]
+
+def fetch_results_for_runs(runs):
+    """Fetch the results of every run concurrently; returns one list per run, in run order."""
+    def fetch(run):
+        results_url = f"{org_url}/{encoded_project}/_apis/test/Runs/{run['id']}/results?api-version=7.1-preview.6"
+        return get_values_cached(results_url) or []
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        return list(pool.map(fetch, runs))
+
+def fetch_all_results(plan_id, top=200):
+    """Every result from the plan's latest `top` runs, as one flat list."""
+    runs_url = f"{org_url}/{encoded_project}/_apis/test/runs?planId={plan_id}&$top={top}&api-version=7.1-preview.2"
+    runs = get_values_cached(runs_url) or []
+    return [result for results in fetch_results_for_runs(runs) for result in results]
+
 # Call the API
 print(f"Fetching test plan...\nURL: {url}")
-response = requests.get(url, headers=headers, auth=auth)
+response = session.get(url)
 
 # Show result
 print("Status:", response.status_code)
 if response.ok:
-    data = response.json()
+    data = jload(response)
     print(" Test Plan Found:")
     print("  ID:", data.get("id"))
     print("  Name:", data.get("name"))
@@ -145,17 +205,19 @@ filters = [
 
 # Step 1: Fetch all suites in flat format
 suites_url = f"{org_url}/{encoded_project}/_apis/testplan/Plans/{plan_id}/suites?api-version=6.0"
-suites_resp = requests.get(suites_url, headers=headers, auth=auth)
+suites_resp = session.get(suites_url)
 
 all_points = []
 
 if suites_resp.ok:
-    all_suites = suites_resp.json().get("value", [])
+    all_suites = jload(suites_resp).get("value", [])
 
-    # Step 2: Match suites if any filter matches the name (case-insensitive)
+    # Step 2: Match suites if any filter matches the name (case-insensitive).
+    # All filters are folded into one compiled alternation so each name is scanned once.
+    filter_pattern = re.compile("|".join(re.escape(f) for f in filters if f), re.IGNORECASE)
     target_suites = [
         s for s in all_suites
-        if any(f.lower() in s.get("name", "").lower() for f in filters if f)
+        if any(filters) and filter_pattern.search(s.get("name", ""))
     ]
     print(f"Found {len(target_suites)} suites matching any of: {filters}")
 
@@ -163,10 +225,10 @@ if suites_resp.ok:
     for suite in target_suites:
         sid = suite["id"]
         points_url = f"{org_url}/{encoded_project}/_apis/test/Plans/{plan_id}/Suites/{sid}/Points?api-version=7.1-preview.2"
-        response = requests.get(points_url, headers=headers, auth=auth)
+        response = session.get(points_url)
 
         if response.ok:
-            for pt in response.json().get("value", []):
+            for pt in jload(response).get("value", []):
                 test_point_id = pt.get("id")
                 title = pt.get("testCase", {}).get("name", "")
                 outcome = pt.get("outcome", "")
@@ -191,84 +253,46 @@ if suites_resp.ok:
 
 print("Collecting test result dates...")
 
-runs_url = f"{org_url}/{encoded_project}/_apis/test/runs?planId={plan_id}&$top=200&api-version=7.1-preview.2"
-runs_resp = requests.get(runs_url, headers=headers, auth=auth)
-
-if runs_resp.ok:
-    runs = runs_resp.json().get("value", [])
-    for run in runs:
-        run_id = run["id"]
-        results_url = f"{org_url}/{encoded_project}/_apis/test/Runs/{run_id}/results?api-version=7.1-preview.6"
-        results_resp = requests.get(results_url, headers=headers, auth=auth)
-
-        if results_resp.ok:
-            results = results_resp.json().get("value", [])
-            for result in results:
-                result_case_id = result.get("testCase", {}).get("id")
-                outcome = result.get("outcome")
-                completed = result.get("completedDate")
-
-                print(f"Result Case ID: {result_case_id}, Completed: {completed}")
-
-                for entry in all_points:
-                    if str(result_case_id) == str(entry["TestCaseID"]):
-                        print(f"Matched TestCaseID {result_case_id} to entry {entry['Title']}")
-                        if outcome == "Passed":
-                            entry["PassedDate"] = completed
-                        if result.get("state") == "Completed":
-                            entry["ClosedDate"] = completed
-
-# Step: Enrich test points with PassedDate / ClosedDate from Results API
-runs_url = f"{org_url}/{encoded_project}/_apis/test/runs?planId={plan_id}&$top=50&api-version=7.1-preview.2"
-runs_resp = requests.get(runs_url, headers=headers, auth=auth)
-
-if runs_resp.ok:
-    runs = runs_resp.json().get("value", [])
-    for run in runs:
-        run_id = run["id"]
-        results_url = f"{org_url}/{encoded_project}/_apis/test/Runs/{run_id}/results?api-version=7.1-preview.6"
-        results_resp = requests.get(results_url, headers=headers, auth=auth)
-
-        if results_resp.ok:
-            results = results_resp.json().get("value", [])
-            for result in results:
-                print(f"Result Case ID: {result.get('testCase', {}).get('id')}, Completed: {result.get('completedDate')}")
-                # title = result.get("automatedTestName") or result.get("testCaseTitle")
-                outcome = result.get("outcome")
-                completed = result.get("completedDate")
-                # for entry in all_points:
-                #     if title and title in entry["Title"]:
-                result_case_id = result.get("testCase", {}).get("id")
-                for entry in all_points:
-                    if result_case_id == entry["TestCaseID"]:
-                        print(f"Matched TestCaseID {result_case_id} to entry {entry['Title']}")
-                        if outcome == "Passed":
-                            entry["PassedDate"] = completed
-                        if result.get("state") == "Completed":
-                            entry["ClosedDate"] = completed
+# Runs + results are fetched once; the enrichment pass and captured_results both read this list
+all_results = fetch_all_results(plan_id)
+
+# Step: Enrich test points with PassedDate / ClosedDate from Results API.
+# A test case can have several points (suites/configurations), so index them all by id once.
+points_by_case = {}
+for entry in all_points:
+    points_by_case.setdefault(str(entry["TestCaseID"]), []).append(entry)
+
+for result in all_results:
+    result_case_id = result.get("testCase", {}).get("id")
+    outcome = result.get("outcome")
+    completed = result.get("completedDate")
+
+    print(f"Result Case ID: {result_case_id}, Completed: {completed}")
+
+    for entry in points_by_case.get(str(result_case_id), []):
+        print(f"Matched TestCaseID {result_case_id} to entry {entry['Title']}")
+        if outcome == "Passed":
+            entry["PassedDate"] = completed
+        if result.get("state") == "Completed":
+            entry["ClosedDate"] = completed
+
 # Step: Capture dates directly from test results
 captured_results = []
-
-runs_url = f"{org_url}/{encoded_project}/_apis/test/runs?planId={plan_id}&$top=200&api-version=7.1-preview.2"
-runs_resp = requests.get(runs_url, headers=headers, auth=auth)
-
-if runs_resp.ok:
-    for run in runs_resp.json().get("value", []):
-        run_id = run["id"]
-        results_url = f"{org_url}/{encoded_project}/_apis/test/Runs/{run_id}/results?api-version=7.1-preview.6"
-        results_resp = requests.get(results_url, headers=headers, auth=auth)
-        if results_resp.ok:
-            for result in results_resp.json().get("value", []):
-                captured_results.append({
-                    "TestCaseID": result.get("testCase", {}).get("id"),
-                    "Title": result.get("testCaseTitle"),
-                    "Outcome": result.get("outcome"),
-                    "CompletedDate": result.get("completedDate"),
-                    "State": result.get("state"),
-                })
+for result in all_results:
+    captured_results.append({
+        "TestCaseID": result.get("testCase", {}).get("id"),
+        "Title": result.get("testCaseTitle"),
+        "Outcome": result.get("outcome"),
+        "CompletedDate": result.get("completedDate"),
+        "State": result.get("state"),
+    })
 
 # Step: Build results DataFrame
 results_df = pd.DataFrame(captured_results)
+# Outcome/State repeat a handful of values across every result; keep them as categories
+for col in ("Outcome", "State"):
+    if col in results_df.columns:
+        results_df[col] = results_df[col].astype("category")
 # print("Test Results (Direct):")
 # print(results_df)
 # Drop invalid/missing TestCaseIDs
@@ -292,6 +316,7 @@ print(latest_results_df)
 ################## PLOT BURNDOWN ##################
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 # Read planned burndown from Excel
@@ -314,16 +339,13 @@ date_range = pd.date_range(start=plot_start_date, end=plot_end_date, freq="D")
 # Total number of test cases
 total_cases = latest_results_df["TestCaseID"].nunique()
 
-# Actual burndown logic (only Passed outcomes)
-total_cases = latest_results_df["TestCaseID"].nunique()
-burndown = []
-for date in date_range:
-    passed = latest_results_df[
-        (latest_results_df["CompletedDate"] <= date) &
-        (latest_results_df["Outcome"] == "Passed")
-    ]
-    remaining = total_cases - passed["TestCaseID"].nunique()
-    burndown.append(remaining)
+# Actual burndown logic (only Passed outcomes).
+# latest_results_df holds one row per TestCaseID, so bucket each pass onto the first
+# plotted day at/after its CompletedDate and cumulate, instead of re-filtering per day.
+passed_dates = latest_results_df.loc[latest_results_df["Outcome"] == "Passed", "CompletedDate"].dropna()
+first_day = np.searchsorted(date_range.asi8, pd.DatetimeIndex(passed_dates).asi8, side="left")
+passed_by_day = np.bincount(first_day, minlength=len(date_range) + 1)[:len(date_range)].cumsum()
+burndown = (total_cases - passed_by_day).tolist()
 
 # Plot both actual and planned burndown
 plt.figure(figsize=(10, 6))
@@ -7,14 +7,20 @@ test_case_burndown_debug.py
 - Dumps raw runs to CSV and prints summaries by state and date.
 - Does NOT join results to points/folders; this is for debugging run availability.
 """
-import os, base64, csv
+import os, base64, csv, heapq
+from collections import Counter
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 from urllib.parse import quote
-from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for ado_json
+from ado_json import jload
+
 # ---- Load .env beside this file ----
 try:
     from dotenv import load_dotenv
@@ -43,20 +49,48 @@ if not (ADO_ORG and ADO_PROJECT and ADO_PAT):
 BASE = (ADO_ORG if ADO_ORG.startswith(("http://","https://")) else f"https://dev.azure.com/{ADO_ORG}").rstrip("/")
 PROJECT_PATH = quote(ADO_PROJECT, safe="")
 
-def headers_basic() -> Dict[str, str]:
-    tok = base64.b64encode(f":{ADO_PAT}".encode()).decode()
-    return {"Authorization": f"Basic {tok}", "Accept": "application/json"}
+# Encoded once at import; the PAT does not change during a run
+_AUTH_HEADERS: Dict[str, str] = {
+    "Authorization": "Basic " + base64.b64encode(f":{ADO_PAT}".encode()).decode(),
+    "Accept": "application/json",
+    # requests already sends this by default; stated explicitly because results pages compress ~5-10x
+    "Accept-Encoding": "gzip, deflate",
+}
+
+# One pooled keep-alive session for every ADO call; auth headers ride on the session.
+# Throttled (429) and transient 5xx GETs are retried with backoff.
+HTTP_TIMEOUT = (5, 60)  # (connect, read) seconds
+TRACE = (first_env("ADO_TRACE", default="") or "").strip().lower() in ("1","true","yes")  # log every GET
+# ADO_CACHE_SECONDS serves unchanged GETs from a local SQLite cache (requires requests-cache);
+# handy for repeated debugging runs, off by default so normal runs always hit the API.
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+_cache_seconds = first_env("ADO_CACHE_SECONDS")
+if _cache_seconds and CachedSession is not None:
+    SESSION = CachedSession("ado_cache", backend="sqlite", expire_after=int(_cache_seconds),
+                            allowable_methods=["GET"], stale_if_error=True)
+    SESSION.cache.delete(expired=True)
+else:
+    SESSION = requests.Session()
+SESSION.headers.update(_AUTH_HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8, pool_maxsize=32,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"]),
+))
 
 def api_url(suffix: str) -> str:
     s = suffix if suffix.startswith("/") else "/" + suffix
     return f"{BASE}/{PROJECT_PATH}{s}"
 
 def get_json(url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    r = requests.get(url, params=params, headers=headers_basic())
-    print(f"GET {r.url}")
+    r = SESSION.get(url, params=params, timeout=HTTP_TIMEOUT)
+    if TRACE:
+        print(f"GET {r.url} [{r.headers.get('Content-Encoding') or 'identity'}]")
     if r.status_code >= 400:
         raise SystemExit(f"HTTP {r.status_code} for GET {r.url}\n{r.text}")
-    return r.json()
+    return jload(r)
 
 def list_plans() -> List[Dict[str, Any]]:
     return get_json(api_url("/_apis/testplan/plans"), {"api-version": TESTPLAN_API_VERSION}).get("value", [])
@@ -76,10 +110,11 @@ def resolve_plan_id() -> str:
         return str(TEST_PLAN_ID)
     raise SystemExit("Provide TEST_PLAN_NAME or TEST_PLAN_ID in .env")
 
-def fetch_runs(date_mode: Optional[str]=None, start: Optional[str]=None, end: Optional[str]=None, top: int=100) -> List[Dict[str, Any]]:
-    """If date_mode is None, no date filters are applied (returns recent runs)."""
+def fetch_runs(date_mode: Optional[str]=None, start: Optional[str]=None, end: Optional[str]=None, top: int=200, plan_id: Optional[str]=None) -> List[Dict[str, Any]]:
+    """If date_mode is None, no date filters are applied (returns recent runs).
+    plan_id, if given, restricts the query to that plan server-side."""
     url = api_url("/_apis/test/runs")
-    params: Dict[str, Any] = {"api-version": TEST_RUNS_API_VERSION, "includeRunDetails": "true", "$top": str(min(top,100))}
+    params: Dict[str, Any] = {"api-version": TEST_RUNS_API_VERSION, "includeRunDetails": "true", "$top": str(top)}
     if date_mode in {"created","updated"} and start and end:
         if date_mode == "created":
             params["minCreatedDate"] = start
@@ -90,14 +125,21 @@ def fetch_runs(date_mode: Optional[str]=None, start: Optional[str]=None, end: Op
         print(f"[i] RUNS mode={date_mode} with dates {start}..{end}")
     else:
         print("[i] RUNS with NO date filters (recent runs)")
+    if plan_id:
+        params["planId"] = plan_id
+        params["planIds"] = plan_id
     out: List[Dict[str, Any]] = []
     while True:
-        r = requests.get(url, params=params, headers=headers_basic())
-        print(f"GET {r.url}")
+        r = SESSION.get(url, params=params, timeout=HTTP_TIMEOUT)
+        if TRACE:
+            print(f"GET {r.url}")
         if r.status_code >= 400:
             raise SystemExit(f"HTTP {r.status_code} for GET {r.url}\n{r.text}")
-        j = r.json()
-        out.extend(j.get("value", []))
+        j = jload(r)
+        page = j.get("value", [])
+        if not page:
+            break
+        out.extend(page)
         token = r.headers.get("x-ms-continuationtoken")
         if not token:
             break
@@ -107,28 +149,41 @@ def fetch_runs(date_mode: Optional[str]=None, start: Optional[str]=None, end: Op
 def summarize_runs(runs: List[Dict[str, Any]], label: str) -> None:
     print(f"\n===== Summary: {label} =====")
     print(f"Total runs: {len(runs)}")
-    # Count by state
-    from collections import Counter
-    states = Counter([(r.get('state') or '').strip().lower() for r in runs])
+    # Count by state and collect the date strings in the same pass
+    states: Counter = Counter()
+    raw_dates: List[Optional[str]] = []
+    for r in runs:
+        states[(r.get('state') or '').strip().lower()] += 1
+        raw_dates.append(r.get("createdDate") or r.get("startedDate"))
     print("States:", dict(states))
-    # Show top 15 newest by createdDate
-    def to_dt(s):
-        s = (s or "").rstrip("Z")
-        try:
-            return datetime.fromisoformat(s.replace("Z","+00:00"))
-        except Exception:
-            return datetime.min
-    newest = sorted(runs, key=lambda r: to_dt(r.get("createdDate") or r.get("startedDate")), reverse=True)[:15]
+    # Show top 15 newest by createdDate (NaT is the minimum int64, so unparseable dates sort last).
+    # nlargest is O(N log 15) and, like a stable reverse sort, keeps earlier runs first on ties.
+    stamps = pd.to_datetime(raw_dates, utc=True, format="ISO8601", errors="coerce", cache=True).asi8.tolist()
+    newest = [runs[i] for i in heapq.nlargest(15, range(len(runs)), key=stamps.__getitem__)]
     for r in newest:
         print(f"  id={r.get('id')}  state={r.get('state')}  created={r.get('createdDate')}  updated={r.get('lastUpdatedDate')}  name={r.get('name')}  planId={(r.get('plan') or {}).get('id')}")
 
 def write_csv(rows: List[Dict[str, Any]], path: Path) -> None:
+    """CSV by default; OUT_FORMAT=parquet writes <name>.parquet next to it instead.
+    Columns are the union of every row's keys, so no field the API returned is dropped."""
     if not rows:
-        pd.DataFrame().to_csv(path, index=False)
+        path.write_text("", encoding="utf-8")
         print(f"[OK] Wrote empty CSV: {path}")
         return
-    cols = sorted({k for r in rows for k in r.keys()})
-    pd.DataFrame(rows, columns=cols).to_csv(path, index=False)
+    cols = sorted({k for r in rows for k in r})
+    if (first_env("OUT_FORMAT", default="csv") or "csv").strip().lower() == "parquet":
+        df = pd.DataFrame(rows, columns=cols)
+        # Raw run dicts carry nested objects (plan, owner, ...); flatten to str so Arrow accepts them
+        obj_cols = [c for c in df.columns if df[c].map(lambda v: isinstance(v, (dict, list))).any()]
+        df[obj_cols] = df[obj_cols].astype(str)
+        path = path.with_suffix(".parquet")
+        df.to_parquet(path, compression="snappy", index=False)
+    else:
+        # Raw API dicts stream straight out; no DataFrame needed just to write CSV
+        with open(path, "w", newline="", buffering=1 << 20, encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=cols)
+            w.writeheader()
+            w.writerows(rows)
     print(f"[OK] Wrote {len(rows)} rows -> {path}")
 
 def main() -> None:
@@ -141,10 +196,10 @@ def main() -> None:
     END_DATE   = first_env("END_DATE")
 
     # Fetch four sets: created(with dates), updated(with dates), created(no dates), updated(no dates)
-    created_d = fetch_runs("created", START_DATE, END_DATE, top=100) if START_DATE and END_DATE else []
-    updated_d = fetch_runs("updated", START_DATE, END_DATE, top=100) if START_DATE and END_DATE else []
-    created_n = fetch_runs("created", None, None, top=100)
-    updated_n = fetch_runs("updated", None, None, top=100)
+    created_d = fetch_runs("created", START_DATE, END_DATE) if START_DATE and END_DATE else []
+    updated_d = fetch_runs("updated", START_DATE, END_DATE) if START_DATE and END_DATE else []
+    created_n = fetch_runs("created", None, None)
+    updated_n = fetch_runs("updated", None, None)
 
     # Summaries BEFORE plan/state filtering
     summarize_runs(created_d, "created with dates")
@@ -1,5 +1,7 @@
 import os
+import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from dotenv import dotenv_values
 from urllib.parse import quote
@@ -94,26 +96,29 @@ except Exception as e:
     print("❌ Failed to parse JSON for suites_response:", e)
     suites = []
 
+# The runs query depends only on the plan, so fetch it once rather than once per suite
+session = requests.Session()
+session.headers.update(headers)
+runs_url = f"{url_config.base_url()}/_apis/test/runs?planId={plan_id}&includeRunDetails=true&$top=1000&api-version=6.0"
+runs = session.get(runs_url).json().get("value", [])
+
+# Fetch each run's results once, concurrently
+def fetch_run_results(run_id):
+    results_url = f"{base_url()}/_apis/test/Runs/{run_id}/results?api-version=6.0"
+    return session.get(results_url).json().get("value", [])
+
+run_ids = list({run["id"] for run in runs})
+with ThreadPoolExecutor(max_workers=16) as ex:
+    results_by_run = dict(zip(run_ids, ex.map(fetch_run_results, run_ids)))
+for run in runs:
+    run["results"] = results_by_run[run["id"]]
+
 test_plans = []
 for suite in suites:
-    suite_id = suite["id"]
-    
-    # Fetch test runs for each suite
-    runs_url = f"{url_config.base_url()}/_apis/test/runs?planId={plan_id}&includeRunDetails=true&$top=1000&api-version=6.0"
-    runs_response = requests.get(runs_url, headers=headers)
-    runs = runs_response.json().get("value", [])
-
-    # For each run, get its test results
-    for run in runs:
-        run_id = run["id"]
-        results_url = f"{base_url}/_apis/test/Runs/{run_id}/results?api-version=6.0"
-        results_response = requests.get(results_url, headers=headers)
-        run["results"] = results_response.json().get("value", [])
-
     test_plans.append({
         "suites": [
             {
-                "id": suite_id,
+                "id": suite["id"],
                 "runs": runs
             }
         ]
@@ -123,25 +128,34 @@ for suite in suites:
 
 # === Rewritten: Fetch and filter test runs by name, iteration, and date ===
 import pandas as pd
-from datetime import datetime
 
 # Step 1: Flatten all test runs
+# Every suite shares the same plan-level run list; keep one copy of each run
+all_runs = list({run['id']: run for plan in test_plans for suite in plan['suites'] for run in suite.get('runs', [])}.values())
+
+# Parse every completedDate in one vectorized pass (repeated strings are parsed once)
+run_dates = pd.to_datetime([run.get('completedDate') for run in all_runs], utc=True, format="ISO8601", errors="coerce", cache=True)
+start_ts = pd.to_datetime(start_date, utc=True)
+end_ts = pd.to_datetime(end_date, utc=True)
+in_range = (run_dates >= start_ts) & (run_dates <= end_ts)
+run_days = run_dates.date
+
+# One alternation scan per run name instead of lowercasing every filter for every run
+name_pattern = re.compile("|".join(re.escape(f.lower()) for f in filters if f))
+
 filtered_runs = []
-for plan in test_plans:
-    for suite in plan['suites']:
-        for run in suite.get('runs', []):
-            run_date = datetime.strptime(run['completedDate'], '%Y-%m-%dT%H:%M:%S.%fZ')
-            name_match = any(substr.lower() in run['name'].lower() for substr in filters)
-            in_date_range = start_date <= run_date <= end_date
-            
-            if name_match and in_date_range:
-                for result in run.get('results', []):
-                    filtered_runs.append({
-                        'Run ID': run['id'],
-                        'Test Case': result.get('testCaseTitle', ''),
-                        'Outcome': result.get('outcome', 'Unknown'),
-                        'Date': run_date.date()
-                    })
+for i, run in enumerate(all_runs):
+    if not in_range[i]:
+        continue
+    name_match = bool(name_pattern.search(run['name'].lower()))
+    if name_match:
+        for result in run.get('results', []):
+            filtered_runs.append({
+                'Run ID': run['id'],
+                'Test Case': result.get('testCaseTitle', ''),
+                'Outcome': result.get('outcome', 'Unknown'),
+                'Date': run_days[i]
+            })
 
 # Step 2: Create DataFrame and print
 df = pd.DataFrame(filtered_runs)
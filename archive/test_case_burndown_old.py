@@ -5,9 +5,16 @@ from typing import Dict, Any, List, Optional
 from pathlib import Path
 from urllib.parse import quote
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for ado_json
+from ado_json import jload
+
 # ---- Load .env ----
 try:
     from dotenv import load_dotenv
@@ -37,20 +44,50 @@ if not (ADO_ORG and ADO_PROJECT and ADO_PAT):
 BASE = (ADO_ORG if ADO_ORG.startswith(("http://","https://")) else f"https://dev.azure.com/{ADO_ORG}").rstrip("/")
 PROJECT_PATH = quote(ADO_PROJECT, safe="")
 
-def headers_basic() -> Dict[str, str]:
-    tok = base64.b64encode(f":{ADO_PAT}".encode()).decode()
-    return {"Authorization": f"Basic {tok}", "Accept": "application/json"}
+# Encoded once at import; the PAT does not change during a run
+_AUTH_HEADERS: Dict[str, str] = {
+    "Authorization": "Basic " + base64.b64encode(f":{ADO_PAT}".encode()).decode(),
+    "Accept": "application/json",
+    # requests already sends this by default; stated explicitly because results pages compress ~5-10x
+    "Accept-Encoding": "gzip, deflate",
+}
+
+# One pooled keep-alive session for every ADO call; auth headers ride on the session.
+# Throttled (429) and transient 5xx GETs are retried with backoff.
+HTTP_TIMEOUT = (5, 60)  # (connect, read) seconds
+# Concurrent fetch workers; the connection pool is sized to match so threads never wait on a socket
+FETCH_WORKERS = max(1, int(first_env("ADO_WORKERS", default="16")))
+TRACE = (first_env("ADO_TRACE", default="") or "").strip().lower() in ("1","true","yes")  # log every GET
+# ADO_CACHE_SECONDS serves unchanged GETs from a local SQLite cache (requires requests-cache);
+# handy for repeated debugging runs, off by default so normal runs always hit the API.
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+_cache_seconds = first_env("ADO_CACHE_SECONDS")
+if _cache_seconds and CachedSession is not None:
+    SESSION = CachedSession("ado_cache", backend="sqlite", expire_after=int(_cache_seconds),
+                            allowable_methods=["GET"], stale_if_error=True)
+    SESSION.cache.delete(expired=True)
+else:
+    SESSION = requests.Session()
+SESSION.headers.update(_AUTH_HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=8, pool_maxsize=max(32, FETCH_WORKERS),
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"]),
+))
 
 def api_url(suffix: str) -> str:
     s = suffix if suffix.startswith("/") else "/" + suffix
     return f"{BASE}/{PROJECT_PATH}{s}"
 
 def get_json(url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    r = requests.get(url, params=params, headers=headers_basic())
-    print(f"GET {r.url}")
+    r = SESSION.get(url, params=params, timeout=HTTP_TIMEOUT)
+    if TRACE:
+        print(f"GET {r.url} [{r.headers.get('Content-Encoding') or 'identity'}]")
     if r.status_code >= 400:
         raise SystemExit(f"HTTP {r.status_code} for GET {r.url}\n{r.text}")
-    return r.json()
+    return jload(r)
 
 # ---- Test Plans API ----
 def list_plans() -> List[Dict[str, Any]]:
@@ -69,6 +106,7 @@ def compute_paths(suites: List[Dict[str, Any]]) -> None:
     by_id = {s["id"]: s for s in suites}
     def nm(x): return (x.get("name") or "").strip()
     for s in suites:
+        s["_name_lc"] = nm(s).lower()
         parts = [nm(s)]
         cur = s
         while True:
@@ -88,15 +126,15 @@ def children_map_for(suites: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, A
     return mp
 
 # ---- Legacy Test API ----
-def list_test_runs(date_mode: str, start: str, end: str, top: int = 100) -> List[Dict[str, Any]]:
-    """date_mode: 'created' or 'updated'"""
+def list_test_runs(date_mode: str, start: str, end: str, top: int = 200, plan_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """date_mode: 'created' or 'updated'. plan_id, if given, is filtered server-side."""
     runs: List[Dict[str, Any]] = []
     url = api_url("/_apis/test/runs")
     assert f"/{PROJECT_PATH}/_apis/test/runs" in url, f"Bad runs URL: {url}"
     params: Dict[str, Any] = {
         "api-version": TEST_RUNS_API_VERSION,
         "includeRunDetails": "true",
-        "$top": str(min(top, 100)),
+        "$top": str(top),
     }
     if date_mode == "created":
         params["minCreatedDate"] = start
@@ -104,15 +142,23 @@ def list_test_runs(date_mode: str, start: str, end: str, top: int = 100) -> List
     else:
         params["minLastUpdatedDate"] = start
         params["maxLastUpdatedDate"] = end
+    if plan_id:
+        # Runs-list takes planId, the lastUpdatedDate query takes planIds; send both so either form filters
+        params["planId"] = plan_id
+        params["planIds"] = plan_id
 
     print(f"[i] RUNS_BASE_URL={url} mode={date_mode}")
     while True:
-        r = requests.get(url, params=params, headers=headers_basic())
-        print(f"GET {r.url}")
+        r = SESSION.get(url, params=params, timeout=HTTP_TIMEOUT)
+        if TRACE:
+            print(f"GET {r.url}")
         if r.status_code >= 400:
             raise SystemExit(f"HTTP {r.status_code} for GET {r.url}\n{r.text}")
-        j = r.json()
-        runs.extend(j.get("value", []))
+        j = jload(r)
+        page = j.get("value", [])
+        if not page:
+            break
+        runs.extend(page)
         token = r.headers.get("x-ms-continuationtoken")
         if not token:
             break
@@ -124,12 +170,16 @@ def list_run_results(run_id: str, top: int = 1000) -> List[Dict[str, Any]]:
     url = api_url(f"/_apis/test/runs/{run_id}/results")
     params: Dict[str, Any] = {"api-version": TEST_RUNS_API_VERSION, "$top": str(top)}
     while True:
-        r = requests.get(url, params=params, headers=headers_basic())
-        print(f"GET {r.url}")
+        r = SESSION.get(url, params=params, timeout=HTTP_TIMEOUT)
+        if TRACE:
+            print(f"GET {r.url}")
         if r.status_code >= 400:
             raise SystemExit(f"HTTP {r.status_code} for GET {r.url}\n{r.text}")
-        j = r.json()
-        results.extend(j.get("value", []))
+        j = jload(r)
+        page = j.get("value", [])
+        if not page:
+            break
+        results.extend(page)
         token = r.headers.get("x-ms-continuationtoken")
         if not token:
             break
@@ -141,12 +191,16 @@ def list_points(plan_id: str, suite_id: str, top: int = 1000) -> List[Dict[str,
     url = api_url("/_apis/test/points")
     params: Dict[str, Any] = {"api-version": TEST_POINTS_API_VERSION, "planId": plan_id, "suiteId": suite_id, "$top": str(top)}
     while True:
-        r = requests.get(url, params=params, headers=headers_basic())
-        print(f"GET {r.url}")
+        r = SESSION.get(url, params=params, timeout=HTTP_TIMEOUT)
+        if TRACE:
+            print(f"GET {r.url}")
         if r.status_code >= 400:
             raise SystemExit(f"HTTP {r.status_code} for GET {r.url}\n{r.text}")
-        j = r.json()
-        pts.extend(j.get("value", []))
+        j = jload(r)
+        page = j.get("value", [])
+        if not page:
+            break
+        pts.extend(page)
         token = r.headers.get("x-ms-continuationtoken")
         if not token:
             break
@@ -159,6 +213,27 @@ def iso_parse(s: str) -> datetime:
         s = s[:-1] + "+00:00"
     return datetime.fromisoformat(s)
 
+def save_frame(df: pd.DataFrame, csv_path: Path) -> Path:
+    """Write Parquet by default (keeps dtypes, smaller, faster to reload); OUT_FORMAT=csv keeps the old CSV."""
+    fmt = (first_env("OUT_FORMAT", default="parquet") or "parquet").strip().lower()
+    if fmt != "csv":
+        out = csv_path.with_suffix(".parquet")
+        try:
+            # Hand the frame to Arrow once and let its C++ writer do the encoding
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), str(out), compression="snappy")
+            return out
+        except ImportError:
+            pass
+        try:
+            df.to_parquet(out, compression="snappy", index=False)  # fastparquet, if that is what's installed
+            return out
+        except ImportError:
+            print("[i] No Parquet engine installed (pyarrow/fastparquet); writing CSV instead.")
+    df.to_csv(csv_path, index=False)
+    return csv_path
+
 # ---- Main ----
 def main() -> None:
     TEST_PLAN_NAME = first_env("TEST_PLAN_NAME")
@@ -203,7 +278,8 @@ def main() -> None:
     if TEST_SUITE_ID and TEST_SUITE_ID in by_id:
         suite_id = TEST_SUITE_ID; found_suite = by_id[suite_id]
     elif TEST_SUITE_NAME:
-        cands = [s for s in suites if (s.get("name","").strip().lower() == TEST_SUITE_NAME.strip().lower())]
+        want = TEST_SUITE_NAME.strip().lower()
+        cands = [s for s in suites if s["_name_lc"] == want]
         if cands:
             cands.sort(key=lambda x: len(x.get("_path","")))
             suite_id = cands[0]["id"]; found_suite = cands[0]
@@ -212,6 +288,12 @@ def main() -> None:
     print(f"[OK] Target suite: id={suite_id} name='{found_suite.get('name')}' path='{found_suite.get('_path','')}'")
 
     children = children_map_for(suites)
+    # parent id -> {lowercased child name -> child}; first child wins on duplicate names, as the linear scan did
+    child_by_name: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for pid, kids in children.items():
+        idx = child_by_name[pid] = {}
+        for k in kids:
+            idx.setdefault(k["_name_lc"], k)
     folder_id: Optional[str] = None
     found_folder: Optional[Dict[str, Any]] = None
     if TEST_FOLDER_ID and TEST_FOLDER_ID in by_id:
@@ -220,18 +302,15 @@ def main() -> None:
         parts = [p.strip().lower() for p in TEST_FOLDER_PATH.split("/") if p.strip()]
         cursor = suite_id; node = found_suite; ok = True
         for part in parts:
-            nxt = None
-            for k in children.get(cursor, []):
-                if (k.get("name","").strip().lower() == part):
-                    nxt = k; break
+            nxt = child_by_name.get(cursor, {}).get(part)
             if not nxt: ok = False; break
             cursor = nxt["id"]; node = nxt
         if ok:
             folder_id = cursor; found_folder = node
     elif TEST_FOLDER_NAME:
-        for k in children.get(suite_id, []):
-            if (k.get("name","").strip().lower() == TEST_FOLDER_NAME.strip().lower()):
-                folder_id = k["id"]; found_folder = k; break
+        k = child_by_name.get(suite_id, {}).get(TEST_FOLDER_NAME.strip().lower())
+        if k:
+            folder_id = k["id"]; found_folder = k
 
     if folder_id:
         print(f"[OK] Target folder/sub-suite: id={folder_id} name='{found_folder.get('name')}' path='{found_folder.get('_path','')}'")
@@ -246,17 +325,16 @@ def main() -> None:
         print("[i] No child folders found; scanning the selected node itself for points.")
     print(f"[OK] Target suites to scan for points: {len(child_folders)}")
 
-    point_to_folder: Dict[str, str] = {}
-    total_points = 0
-    for child in child_folders:
-        cid = child["id"]
-        cname = child.get("name")
-        pts = list_points(plan_id, cid)
-        total_points += len(pts)
-        for p in pts:
-            pid_val = str(p.get("id") or p.get("pointId"))
-            if pid_val and pid_val != "None":
-                point_to_folder[pid_val] = cname
+    # One paginated points call per child folder; fetch them concurrently
+    with ThreadPoolExecutor(max_workers=min(8, FETCH_WORKERS)) as ex:
+        pts_per_child = list(ex.map(lambda c: (c.get("name"), list_points(plan_id, c["id"])), child_folders))
+    total_points = sum(len(pts) for _, pts in pts_per_child)
+    point_to_folder: Dict[str, str] = {
+        str(p.get("id") or p.get("pointId")): cname
+        for cname, pts in pts_per_child
+        for p in pts
+        if p.get("id") or p.get("pointId")
+    }
     print(f"[OK] Collected {len(point_to_folder)} point mappings from {total_points} points.")
 
     START_DATE = first_env("START_DATE")
@@ -271,11 +349,11 @@ def main() -> None:
         RUN_DATE_MODE = "created"
 
     # Pull runs by chosen date mode; if none, retry the other mode automatically
-    runs = list_test_runs(RUN_DATE_MODE, START_DATE, END_DATE, top=100)
+    runs = list_test_runs(RUN_DATE_MODE, START_DATE, END_DATE, plan_id=plan_id)
     if not runs:
         alt = "updated" if RUN_DATE_MODE == "created" else "created"
         print(f"[i] No runs with mode={RUN_DATE_MODE}. Retrying with mode={alt}...")
-        runs = list_test_runs(alt, START_DATE, END_DATE, top=100)
+        runs = list_test_runs(alt, START_DATE, END_DATE, plan_id=plan_id)
         RUN_DATE_MODE = alt
 
     print(f"[OK] Raw runs fetched (mode={RUN_DATE_MODE}): {len(runs)}")
@@ -283,56 +361,65 @@ def main() -> None:
     # Optional filters
     require_name = (first_env("REQUIRE_PLAN_IN_NAME", default="false") or "false").strip().lower() in ("1","true","yes")
     state_list = (first_env("RUN_STATES", default="Completed,InProgress,Aborted") or "").split(",")
-    state_list = [s.strip().lower() for s in state_list if s.strip()]
-
-    # Filter: plan (always)
-    runs = [r for r in runs if str((r.get("plan") or {}).get("id")) == str(plan_id)]
-    print(f"[OK] Runs after plan filter: {len(runs)}")
-
-    # Filter: state (if any listed)
-    if state_list:
-        runs = [r for r in runs if (r.get("state") or "").strip().lower() in state_list]
-    print(f"[OK] Runs after state filter {state_list}: {len(runs)}")
-
-    # Filter: name contains plan name (optional)
-    if require_name:
-        plan_name = (plan.get("name") or "").strip().lower()
-        if plan_name:
-            runs = [r for r in runs if plan_name in (r.get("name","").strip().lower())]
-        print(f"[OK] Runs after name-contains filter: {len(runs)}")
+    state_set = frozenset(s.strip().lower() for s in state_list if s.strip())
+
+    # Filters fused into one pass: plan (always), state (if any listed), name contains plan name (optional).
+    # The plan is already filtered server-side; the check stays as a cheap guard in case the API ignores it.
+    pid_str = str(plan_id)
+    needle = (plan.get("name") or "").strip().lower() if require_name else ""
+    fetched = len(runs)
+    runs = [
+        r for r in runs
+        if str((r.get("plan") or {}).get("id")) == pid_str
+        and (not state_set or (r.get("state") or "").strip().lower() in state_set)
+        and (not needle or needle in (r.get("name") or "").strip().lower())
+    ]
+    print(f"[OK] Runs after plan/state{'/name-contains' if needle else ''} filters {sorted(state_set)}: {fetched} -> {len(runs)}")
 
     print(f"[OK] Retrieved {len(runs)} runs in {START_DATE}..{END_DATE} for plan {plan_id}.")
 
     # ---- Compile results into a DataFrame ----
-    rows: List[Dict[str, Any]] = []
+    # Runs are independent, so fetch their results concurrently over the shared session pool.
+    # Runs that report zero tests (includeRunDetails) have nothing to fetch.
+    run_ids = [str(run.get("id")) for run in runs if run.get("totalTests", 1) != 0]
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        results_by_run = dict(zip(run_ids, ex.map(list_run_results, run_ids)))
+
+    # Accumulate column-wise; one list per output column instead of a dict per row
+    cols: Dict[str, List[Any]] = {k: [] for k in (
+        "folder", "run_id", "run_name", "started", "completed", "outcome",
+        "testCaseId", "testCaseTitle", "configurationName", "owner",
+    )}
     for run in runs:
         run_id = str(run.get("id"))
         run_name = run.get("name")
         started = run.get("createdDate") or run.get("startedDate")
         completed = run.get("completedDate")
-        for res in list_run_results(run_id):
+        owner = (run.get("owner") or {}).get("displayName")
+        for res in results_by_run.get(run_id, []):
             ptid = str(res.get("pointId"))
             folder = point_to_folder.get(ptid)
             if not folder:
                 continue
-            rows.append({
-                "folder": folder,
-                "run_id": run_id,
-                "run_name": run_name,
-                "started": started,
-                "completed": completed,
-                "outcome": res.get("outcome"),
-                "testCaseId": (res.get("testCase", {}) or {}).get("id"),
-                "testCaseTitle": res.get("testCaseTitle") or (res.get("testCase", {}) or {}).get("name"),
-                "configurationName": (res.get("configuration") or {}).get("name"),
-                "owner": (run.get("owner") or {}).get("displayName"),
-            })
-
-    df = pd.DataFrame.from_records(rows)
-    out_csv = Path(__file__).with_name("plan_runs_by_folder.csv")
-    df.to_csv(out_csv, index=False)
+            tc = res.get("testCase", {}) or {}
+            cols["folder"].append(folder)
+            cols["run_id"].append(run_id)
+            cols["run_name"].append(run_name)
+            cols["started"].append(started)
+            cols["completed"].append(completed)
+            cols["outcome"].append(res.get("outcome"))
+            cols["testCaseId"].append(tc.get("id"))
+            cols["testCaseTitle"].append(res.get("testCaseTitle") or tc.get("name"))
+            cols["configurationName"].append((res.get("configuration") or {}).get("name"))
+            cols["owner"].append(owner)
+
+    df = pd.DataFrame(cols)
+    df["started"] = pd.to_datetime(df["started"], utc=True, errors="coerce", cache=True)
+    df["completed"] = pd.to_datetime(df["completed"], utc=True, errors="coerce", cache=True)
+    df = df.astype({"folder": "category", "outcome": "category"})
+    out_path = save_frame(df, Path(__file__).with_name("plan_runs_by_folder.csv"))
     print(f"[OK] Compiled {len(df)} results across {len(runs)} runs from target suites.")
-    print(f"[OK] Saved DataFrame to {out_csv}")
+    print(f"[OK] Saved DataFrame to {out_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,38 @@
+"""Report settings from .env, parsed once and shared by the bug/UAT report scripts."""
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from dotenv import dotenv_values
+
+REQUIRED_KEYS = ["ADO_ORG", "ADO_PROJECT", "ADO_PAT", "AREA_PATH", "ITERATION_PATH", "START_DATE", "END_DATE"]
+
+
+@dataclass(frozen=True, slots=True)
+class ReportConfig:
+    organization: str
+    project: str
+    pat: str = field(repr=False)  # keep the PAT out of printed diagnostics
+    area_path: str
+    iteration_path: str
+    start_date: datetime
+    end_date: datetime
+    cache_seconds: int = 0  # ADO_CACHE_SECONDS; 0 turns the on-disk work-item caches off
+
+
+def load_config(path=".env"):
+    """Read `path` into a ReportConfig; exits with the list of missing keys if any are blank."""
+    values = dotenv_values(path)
+    missing = [key for key in REQUIRED_KEYS if values.get(key) in [None, ""]]
+    if missing:
+        print(f"\n ERROR: Missing required .env values: {', '.join(missing)}")
+        raise SystemExit(1)
+    return ReportConfig(
+        organization=values["ADO_ORG"],
+        project=values["ADO_PROJECT"],
+        pat=values["ADO_PAT"],
+        area_path=values["AREA_PATH"],
+        iteration_path=values["ITERATION_PATH"],
+        start_date=datetime.fromisoformat(values["START_DATE"]),
+        end_date=datetime.fromisoformat(values["END_DATE"]),
+        cache_seconds=int(values.get("ADO_CACHE_SECONDS") or 0),
+    )
@@ -1,130 +1,251 @@
 import os
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import base64
 import pandas as pd
 from datetime import datetime
+from pathlib import Path
+import matplotlib
+matplotlib.use("Agg")  # file output only; no GUI backend to initialise
 import matplotlib.pyplot as plt
-from dotenv import dotenv_values
+from PIL import Image  # ships with matplotlib
+from config import load_config
 from zoneinfo import ZoneInfo
+import re
 import textwrap 
 import sys
+import gzip
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from ado_json import jload
+
+# Chart output folder, created once up front
+CHARTS = Path("charts")
+CHARTS.mkdir(exist_ok=True)
 
-# Load environment variables
-config = dotenv_values(".env")
-
-organization = config.get("ADO_ORG")
-project = config.get("ADO_PROJECT")
-pat = config.get("ADO_PAT")
-area_path = config.get("AREA_PATH")
-iteration_path = config.get("ITERATION_PATH")
-start_date = datetime.fromisoformat(config.get("START_DATE"))
-end_date = datetime.fromisoformat(config.get("END_DATE"))
-
-# WIQL query
-wiql_query = {
-    "query": f"""
-    SELECT
-        [System.Id],
-        [System.WorkItemType],
-        [System.Title],
-        [System.AssignedTo],
-        [System.State],
-        [System.Tags],
-        [Microsoft.VSTS.Common.Severity],
-        [Microsoft.VSTS.Common.ClosedDate],
-        [System.CreatedDate]
-    FROM workitems
-    WHERE
-        [System.TeamProject] = '{project}'
-        AND (
-            [System.WorkItemType] = 'Bug'
-            AND [System.AreaPath] = '{area_path}'
-            AND [System.IterationPath] = '{iteration_path}'
+# Report timestamp shared by every chart (US Eastern when tz data is available)
+try:
+    TZ = ZoneInfo("America/New_York")
+except Exception:
+    TZ = None
+NOW = datetime.now(TZ) if TZ else datetime.now()
+TODAY = NOW.strftime("%Y-%m-%d")
+FOOTER = NOW.strftime("Generated %Y-%m-%d at %I:%M %p %Z") if TZ else \
+         NOW.strftime("Generated %Y-%m-%d at %I:%M %p")
+
+# Shared chart palette; both summary charts gather their colors from it
+TAB20 = plt.get_cmap("tab20")
+
+# The summary charts are placed 6in wide in the UAT report; 12in at 110 dpi (1320px) is still
+# ~220 ppi there, at well under half the pixels Agg fills and JPEG encodes at 180 dpi
+CHART_DPI = 110
+
+_summary_fig = None
+
+def summary_figure():
+    """The status and severity charts share one 12x6.5in figure, cleared between uses,
+    so the canvas/renderer and font caches are set up once per run."""
+    global _summary_fig
+    if _summary_fig is None:
+        # Constrained layout is solved at draw time, replacing the per-chart tight_layout pass;
+        # the rect keeps the band above y=0.92 for suptitle/subtitle and below 0.03 for the footer
+        _summary_fig = plt.figure(figsize=(12, 6.5), layout="constrained")
+        _summary_fig.get_layout_engine().set(rect=(0, 0.03, 1, 0.89))
+    else:
+        _summary_fig.clear()
+    return _summary_fig
+
+def save_jpeg(fig, out_path, dpi):
+    """Render on the Agg canvas and hand its RGBA buffer straight to Pillow,
+    skipping savefig's format dispatch and extra buffer copies."""
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    w, h = fig.canvas.get_width_height()
+    img = Image.frombuffer("RGBA", (w, h), fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1).convert("RGB")
+    img.save(out_path, "JPEG", quality=85, optimize=True, progressive=True)
+
+def category_colors(col, labels):
+    """(n, 4) RGBA array for `labels`, gathered by category code from one TAB20 palette laid
+    out over the column's categories, so a label's color doesn't depend on its chart position.
+    Labels that aren't categories (e.g. "Unspecified") get slots appended after them."""
+    cats = col.cat.categories.astype(str)
+    cats = cats.append(pd.Index(labels).difference(cats, sort=False))
+    rgba = TAB20(np.arange(len(cats)) / max(1, len(cats)))
+    return rgba[cats.get_indexer(labels)]
+
+def wiql_literal(value):
+    """Quote a value for WIQL; embedded single quotes are escaped by doubling them."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+# Define the fields you want to retrieve (matching your WIQL SELECT)
+fields = [
+    "System.Id",
+    "System.WorkItemType",
+    "System.Title",
+    "System.AssignedTo",
+    "System.State",
+    "System.Tags",
+    "Microsoft.VSTS.Common.Severity",   # Added severity
+    "Microsoft.VSTS.Common.ClosedDate",
+    "System.CreatedDate"
+]
+
+def fetch_bugs(config):
+    """Query ADO for the bugs in the .env scope; returns one row per bug, one column per field."""
+    organization = config.organization
+    project = config.project
+    pat = config.pat
+    area_path = config.area_path
+    iteration_path = config.iteration_path
+    start_date = config.start_date
+    end_date = config.end_date
+
+    # WIQL query. The project comes from the @project macro (the wiql URL is project-scoped);
+    # only the area/iteration/date values are interpolated, as escaped literals. The template's
+    # whitespace is collapsed before they go in, so the text (and the disk-cache key hashed from
+    # it) is canonical while spaces inside a quoted path are kept exactly as written.
+    wiql_template = " ".join("""
+        SELECT
+            [System.Id],
+            [System.WorkItemType],
+            [System.Title],
+            [System.AssignedTo],
+            [System.State],
+            [System.Tags],
+            [Microsoft.VSTS.Common.Severity],
+            [Microsoft.VSTS.Common.ClosedDate],
+            [System.CreatedDate]
+        FROM workitems
+        WHERE
+            [System.TeamProject] = @project
             AND (
-                [System.CreatedDate] >= '{start_date.isoformat()}'
-                AND [System.CreatedDate] <= '{end_date.isoformat()}'
+                [System.WorkItemType] = 'Bug'
+                AND [System.AreaPath] = {area_path}
+                AND [System.IterationPath] = {iteration_path}
+                AND (
+                    [System.CreatedDate] >= {start}
+                    AND [System.CreatedDate] <= {end}
+                )
             )
+        """.split())
+    wiql_query = {
+        "query": wiql_template.format(
+            area_path=wiql_literal(area_path),
+            iteration_path=wiql_literal(iteration_path),
+            start=wiql_literal(start_date.isoformat()),
+            end=wiql_literal(end_date.isoformat()),
         )
-    """
-}
-
-# Encode PAT for Azure DevOps auth
-auth = base64.b64encode(f":{pat}".encode()).decode()
-headers = {
-    "Content-Type": "application/json",
-    "Authorization": f"Basic {auth}"
-}
-
-# Query ADO
-wiql_url = f"https://dev.azure.com/{organization}/{project}/_apis/wit/wiql?api-version=6.0"
-response = requests.post(wiql_url, headers=headers, json=wiql_query)
-print("URL ->", repr(wiql_url))
-print("WIQL->", wiql_query["query"])
-print("RESP->", response.status_code, response.text[:500])
-response.raise_for_status()
-work_item_ids = [item["id"] for item in response.json().get("workItems", [])]
-
-
-# Build a DataFrame from the work item IDs
-if work_item_ids:
-    # Build URL for batch request
-    ids_str = ",".join(map(str, work_item_ids))
-    items_url = f"https://dev.azure.com/{organization}/{project}/_apis/wit/workitemsbatch?api-version=6.0"
-
-    # Define the fields you want to retrieve (matching your WIQL SELECT)
-    payload = {
-        "ids": work_item_ids,
-        "fields": [
-            "System.Id",
-            "System.WorkItemType",
-            "System.Title",
-            "System.AssignedTo",
-            "System.State",
-            "System.Tags",
-            "Microsoft.VSTS.Common.Severity",   # Added severity
-            "Microsoft.VSTS.Common.ClosedDate",
-            "System.CreatedDate"
-        ]
     }
 
-    resp = requests.post(items_url, headers=headers, json=payload)
-    resp.raise_for_status()
+    # Encode PAT for Azure DevOps auth
+    auth = base64.b64encode(f":{pat}".encode()).decode()
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Basic {auth}"
+    }
 
-    work_items = resp.json().get("value", [])
+    # One keep-alive session for every ADO call so the TLS handshake is paid once.
+    # Throttled (429) and transient 5xx responses are retried with backoff; WIQL and
+    # workitemsbatch are read-only queries, so retrying their POSTs is safe.
+    session = requests.Session()
+    session.headers.update(headers)
+    session.headers["Connection"] = "keep-alive"
+    session.mount("https://", HTTPAdapter(
+        pool_connections=4, pool_maxsize=8,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                          allowed_methods=["GET", "POST"]),
+    ))
+    http_timeout = (5, 30)  # (connect, read) seconds
+
+    # Query ADO
+    wiql_url = f"https://dev.azure.com/{organization}/{project}/_apis/wit/wiql?api-version=6.0"
+    items_url = f"https://dev.azure.com/{organization}/{project}/_apis/wit/workitemsbatch?api-version=6.0"
 
-    # Convert to DataFrame
-    df = pd.DataFrame([
-        {field: item["fields"].get(field) for field in payload["fields"]}
-        for item in work_items
-    ])
+    def fetch_chunk(ids):
+        # errorPolicy=omit: an id deleted between the WIQL and this call comes back as null
+        # instead of failing (and re-requesting) the whole 200-id chunk
+        resp = session.post(items_url, json={"ids": ids, "fields": fields, "errorPolicy": "omit"}, timeout=(5, 60))
+        resp.raise_for_status()
+        return jload(resp).get("value", [])
+
+    def fetch_work_items():
+        """WIQL for the matching ids, then their fields via workitemsbatch.
+
+        WIQL only ever returns ids (there is no $expand=fields on the wiql endpoint), so the
+        second round trip is unavoidable; it reuses the WIQL call's keep-alive connection."""
+        response = session.post(wiql_url, json=wiql_query, timeout=http_timeout)
+        print("URL ->", repr(wiql_url))
+        print("WIQL->", wiql_query["query"])
+        print("RESP->", response.status_code, response.text[:500])
+        response.raise_for_status()
+        work_item_ids = [item["id"] for item in jload(response).get("workItems", [])]
+        if not work_item_ids:
+            return []
+        # workitemsbatch takes at most 200 ids per call; fetch the chunks concurrently
+        # (bounded so we stay well inside ADO's rate limits), keeping WIQL order
+        chunks = [work_item_ids[i:i + 200] for i in range(0, len(work_item_ids), 200)]
+        with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as ex:
+            return [item for item in chain.from_iterable(ex.map(fetch_chunk, chunks)) if item]
+
+    # Optional on-disk cache for chart-only re-runs: ADO_CACHE_SECONDS=<ttl> in .env reuses
+    # .cache/<sha256 of query+url+fields>.json.gz while it is younger than the TTL. Off by default
+    # so the daily report always reflects live data.
+    cache_seconds = config.cache_seconds
+
+    def cached_work_items():
+        if cache_seconds <= 0:
+            return fetch_work_items()
+        key = hashlib.sha256(json.dumps({"q": wiql_query, "url": items_url, "fields": fields}, sort_keys=True).encode()).hexdigest()
+        path = os.path.join(".cache", f"{key}.json.gz")
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) < cache_seconds:
+            print(f"Using cached work items -> {path}")
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        items = fetch_work_items()
+        os.makedirs(".cache", exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(items, f)
+        return items
+
+    work_items = cached_work_items()
+
+    # Build a DataFrame from the work items
+    if work_items:
+        # Convert to DataFrame: flatten only the "fields" level (AssignedTo stays a dict),
+        # then keep the requested fields in order; reindex tolerates fields no item returned
+        df = (
+            pd.json_normalize(work_items, max_level=1)
+            .reindex(columns=["fields." + f for f in fields])
+            .rename(columns=lambda c: c[len("fields."):])
+        )
+        # Low-cardinality labels: categorical codes are smaller and count faster than object strings
+        df["System.State"] = df["System.State"].astype("category")
+        df["Microsoft.VSTS.Common.Severity"] = df["Microsoft.VSTS.Common.Severity"].astype("category")
 
-    print(df)
-else:
-    print("No work items found.")
+        print(df)
+    else:
+        print("No work items found.")
+        df = pd.DataFrame(columns=fields)
+    return df
 
 
 # --- Status summary charts (donut + bar) ---
-import matplotlib.pyplot as plt
-from datetime import datetime
-try:
-    from zoneinfo import ZoneInfo   # Py3.9+
-    tz = ZoneInfo("America/New_York")
-except Exception:
-    tz = None
-
-# Guard: empty DF
-if df.empty:
-    print("No data to chart.")
-else:
+def render_status(df, scope):
+    if df.empty:
+        print("No data to chart.")
+        return
     # Count by state
     state_col = "System.State"
-    counts = (
-        df[state_col]
-        .dropna()
-        .astype(str)
-        .value_counts()
-    )
+    # Counts run over the categorical codes; drop categories with no rows
+    counts = df[state_col].value_counts(dropna=True)
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
 
     total = int(counts.sum())
     pct = (counts / total * 100.0).round(1)
@@ -136,22 +257,14 @@ else:
     counts = counts.reindex(ordered_index)
     pct = pct.reindex(ordered_index)
 
-    # Timestamp (EST)
-    now = datetime.now(tz) if tz else datetime.now()
-    today_str = now.strftime("%Y-%m-%d")
-
     # Figure
-    fig = plt.figure(figsize=(12, 6.5))
+    fig = summary_figure()
     gs = fig.add_gridspec(1, 2, width_ratios=[1, 1.3])
     ax1 = fig.add_subplot(gs[0, 0])  # donut
     ax2 = fig.add_subplot(gs[0, 1])  # bar
 
-    #Create a fixed color mapping based on status order
-    color_map = plt.get_cmap('tab20')  # or 'tab10', 'Set2', etc.
-    status_colors = {status: color_map(i / len(counts)) for i, status in enumerate(counts.index)}
-
-    # Get color list in correct order
-    colors = [status_colors[status] for status in counts.index]
+    # Fixed color per status, shared by donut and bar
+    colors = category_colors(df[state_col], counts.index)
 
     # --- Donut chart ---
     wedges, texts, autotexts = ax1.pie(
@@ -168,92 +281,68 @@ else:
     ax1.set_title("Bug Distribution by Status", pad=16, fontsize=12)
 
     # Radial labels (status names) near wedges
-    for w, name in zip(wedges, counts.index):
-        ang = (w.theta2 + w.theta1) / 2.0
-        x = 1.1 * np.cos(np.deg2rad(ang))
-        y = 1.1 * np.sin(np.deg2rad(ang))
+    angs = np.deg2rad([(w.theta1 + w.theta2) / 2.0 for w in wedges])
+    for x, y, name in zip(1.1 * np.cos(angs), 1.1 * np.sin(angs), counts.index):
         ax1.text(x, y, name, ha="center", va="center", fontsize=9)
 
     # --- Bar chart ---
-    bars = ax2.bar(counts.index, counts.values, color=colors) 
+    ax2.bar(counts.index, counts.values, color=colors)
     ax2.set_title("Status Count Bar Chart", pad=10, fontsize=12)
     ax2.set_ylabel("Number of Bugs")
     ax2.set_xlabel("Status")
-    ax2.set_ylim(0, max(counts.values) * 1.20 if total else 1)
+    ax2.set_ylim(0, counts.values.max() * 1.20 if total else 1)
 
     # Annotate each bar with "N (PCT%)"
-    for rect, n, p in zip(bars, counts.values, pct.values):
-        ax2.text(
-            rect.get_x() + rect.get_width()/2.0,
-            rect.get_height() + (max(counts.values)*0.03 if total else 0.5),
-            f"{int(n)} ({p:.1f}%)",
-            ha="center", va="bottom", fontsize=10, weight="bold"
-        )
-    # Slant x labels a bit
-    for tick in ax2.get_xticklabels():
-        tick.set_rotation(30)
-        tick.set_ha("right")
+    # Categorical bars sit at x = 0..n-1 with height = count; compute all label positions at once
+    xs = np.arange(len(counts))
+    ys = counts.values + (counts.values.max() * 0.03 if total else 0.5)
+    for x, y, n, p in zip(xs, ys, counts.values, pct.values):
+        ax2.text(x, y, f"{int(n)} ({p:.1f}%)", ha="center", va="bottom", fontsize=10, weight="bold")
+    # Slant x labels a bit (one bulk property update instead of per-label setters)
+    ax2.tick_params(axis="x", labelrotation=30)
+    plt.setp(ax2.get_xticklabels(), ha="right", rotation_mode="anchor")
 
     # --- Titles / subtitle / footer ---
-    fig.suptitle(f"Daily Status Snapshot as of {today_str}", fontsize=16, y=0.98)
-    # Show your Area/Iteration under the title (they already exist above in your script)
-    subtitle = f"Area Path: {area_path}   |   Iteration Path: {iteration_path}"
-    fig.text(0.5, 0.93, subtitle, ha="center", fontsize=10)
-
-    footer = now.strftime("Generated %Y-%m-%d at %I:%M %p %Z") if tz else \
-             now.strftime("Generated %Y-%m-%d at %I:%M %p")
-    fig.text(0.99, 0.02, footer, ha="right", fontsize=9)
+    fig.suptitle(f"Daily Status Snapshot as of {TODAY}", fontsize=16, y=0.98)
+    # Area/Iteration line under the title
+    fig.text(0.5, 0.93, scope, ha="center", fontsize=10)
 
-    plt.tight_layout(rect=[0, 0.03, 1, 0.92])
+    fig.text(0.99, 0.02, FOOTER, ha="right", fontsize=9)
 
-    # Save
-    out_path = "charts/status_summary.jpg"
-    plt.savefig(out_path, dpi=180)
-    plt.close(fig)
+    # Save (figure stays open; the severity chart reuses it)
+    out_path = CHARTS / "status_summary.jpg"
+    save_jpeg(fig, out_path, dpi=CHART_DPI)
     print(f"Saved chart -> {out_path}")
+    return out_path
 
 
 # --- Severity summary charts (donut + bar) ---
-import matplotlib.pyplot as plt
-import numpy as np
-import re
-from datetime import datetime
-try:
-    from zoneinfo import ZoneInfo
-    tz = ZoneInfo("America/New_York")
-except Exception:
-    tz = None
-
 sev_col = "Microsoft.VSTS.Common.Severity"
-
-if df.empty or sev_col not in df.columns:
-    print("No data/column to chart for severity.")
-else:
-    # Normalize + count
-    sev_series = df[sev_col].fillna("Unspecified").astype(str)
-
-    # Sort by the leading number if present (e.g., "2 - Low", "3 - Moderate"...)
-    def sev_sort_key(label: str) -> int:
-        m = re.match(r"\s*(\d+)", label)
-        return int(m.group(1)) if m else 999
-
-    counts = (
-        sev_series.value_counts()
-        .sort_index(key=lambda idx: [sev_sort_key(s) for s in idx])
-    )
+# Leading severity number ("3 - Moderate" -> 3); compiled once, anchored so non-matches fail fast
+SEV_RE = re.compile(r"^\s*(\d+)")
+
+def render_severity(df, scope):
+    if df.empty or sev_col not in df.columns:
+        print("No data/column to chart for severity.")
+        return
+    # Count on the categorical codes; missing severities are reported as "Unspecified"
+    counts = df[sev_col].value_counts(dropna=True)
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
+    n_unspecified = int(df[sev_col].isna().sum())
+    if n_unspecified:
+        counts["Unspecified"] = n_unspecified
+
+    # Sort by the leading number if present (e.g., "2 - Low", "3 - Moderate"...); others last
+    sev_key = counts.index.str.extract(SEV_RE, expand=False).astype(float)
+    counts = counts.iloc[np.argsort(np.nan_to_num(sev_key.to_numpy(), nan=999), kind="stable")]
     total = int(counts.sum())
     pct = (counts / total * 100.0).round(1)
 
     # Shared color scheme for both charts
-    cmap = plt.get_cmap("tab20")
-    color_map = {name: cmap(i / max(1, len(counts))) for i, name in enumerate(counts.index)}
-    colors = [color_map[name] for name in counts.index]
+    colors = category_colors(df[sev_col], counts.index)
 
-    # Timestamp + titles
-    now = datetime.now(tz) if tz else datetime.now()
-    today_str = now.strftime("%Y-%m-%d")
-
-    fig = plt.figure(figsize=(12, 6.5))
+    fig = summary_figure()
     gs = fig.add_gridspec(1, 2, width_ratios=[1, 1.3])
     ax1 = fig.add_subplot(gs[0, 0])  # donut
     ax2 = fig.add_subplot(gs[0, 1])  # bar
@@ -272,59 +361,36 @@ else:
     ax1.set_title("Bug Distribution by Severity", pad=16, fontsize=12)
 
     # Status labels around ring
-    for w, name in zip(wedges, counts.index):
-        ang = (w.theta2 + w.theta1) / 2.0
-        x = 1.1 * np.cos(np.deg2rad(ang))
-        y = 1.1 * np.sin(np.deg2rad(ang))
+    angs = np.deg2rad([(w.theta1 + w.theta2) / 2.0 for w in wedges])
+    for x, y, name in zip(1.1 * np.cos(angs), 1.1 * np.sin(angs), counts.index):
         ax1.text(x, y, name, ha="center", va="center", fontsize=9)
 
     # --- Bar chart ---
-    bars = ax2.bar(counts.index, counts.values, color=colors)
+    ax2.bar(counts.index, counts.values, color=colors)
     ax2.set_title("Severity Count Bar Chart", pad=10, fontsize=12)
     ax2.set_ylabel("Number of Bugs")
     ax2.set_xlabel("Severity Level")
-    ax2.set_ylim(0, max(counts.values) * 1.20 if total else 1)
-
-    for rect, n, p in zip(bars, counts.values, pct.values):
-        ax2.text(
-            rect.get_x() + rect.get_width() / 2.0,
-            rect.get_height() + (max(counts.values) * 0.03 if total else 0.5),
-            f"{int(n)} ({p:.1f}%)",
-            ha="center",
-            va="bottom",
-            fontsize=10,
-            weight="bold",
-        )
+    ax2.set_ylim(0, counts.values.max() * 1.20 if total else 1)
+
+    xs = np.arange(len(counts))
+    ys = counts.values + (counts.values.max() * 0.03 if total else 0.5)
+    for x, y, n, p in zip(xs, ys, counts.values, pct.values):
+        ax2.text(x, y, f"{int(n)} ({p:.1f}%)", ha="center", va="bottom", fontsize=10, weight="bold")
 
-    for tick in ax2.get_xticklabels():
-        tick.set_rotation(30)
-        tick.set_ha("right")
+    ax2.tick_params(axis="x", labelrotation=30)
+    plt.setp(ax2.get_xticklabels(), ha="right", rotation_mode="anchor")
 
     # Page title / subtitle / footer
-    fig.suptitle(f"Daily Severity Snapshot as of {today_str}", fontsize=16, y=0.98)
-    fig.text(0.5, 0.93, f"Area Path: {area_path}   |   Iteration Path: {iteration_path}",
-             ha="center", fontsize=10)
-    footer = now.strftime("Generated %Y-%m-%d at %I:%M %p %Z") if tz else \
-             now.strftime("Generated %Y-%m-%d at %I:%M %p")
-    fig.text(0.99, 0.02, footer, ha="right", fontsize=9)
-
-    plt.tight_layout(rect=[0, 0.03, 1, 0.92])
-    out_path = "charts/severity_summary.jpg"
-    plt.savefig(out_path, dpi=180)
-    plt.close(fig)
+    fig.suptitle(f"Daily Severity Snapshot as of {TODAY}", fontsize=16, y=0.98)
+    fig.text(0.5, 0.93, scope, ha="center", fontsize=10)
+    fig.text(0.99, 0.02, FOOTER, ha="right", fontsize=9)
+
+    out_path = CHARTS / "severity_summary.jpg"
+    save_jpeg(fig, out_path, dpi=CHART_DPI)
     print(f"Saved chart -> {out_path}")
+    return out_path
 
 # --- Severity 4 & 5 bug table (fixed size, wrapped, locked row heights) ---
-import matplotlib.pyplot as plt
-import pandas as pd
-import re, textwrap
-from datetime import datetime
-try:
-    from zoneinfo import ZoneInfo
-    tz = ZoneInfo("America/New_York")
-except Exception:
-    tz = None
-
 sev_field = "Microsoft.VSTS.Common.Severity"
 cols_needed = ["System.Id", sev_field, "System.Title", "System.State"]
 
@@ -332,11 +398,6 @@ cols_needed = ["System.Id", sev_field, "System.Title", "System.State"]
 WIDTH_PX, HEIGHT_PX, DPI = 1058, 645, 100
 FIG_W_IN, FIG_H_IN = WIDTH_PX / DPI, HEIGHT_PX / DPI
 
-def _sev_num(val):
-    if pd.isna(val): return None
-    m = re.match(r"\s*(\d+)", str(val))
-    return int(m.group(1)) if m else None
-
 def wrap_cell(s, width=44, max_lines=2):
     lines = textwrap.wrap(str(s or ""), width=width, break_long_words=False)
     if len(lines) > max_lines:
@@ -345,12 +406,15 @@ def wrap_cell(s, width=44, max_lines=2):
             lines[-1] += "…"
     return "\n".join(lines)
 
-if df.empty or not set(cols_needed).issubset(df.columns):
-    print("No data/columns to build Severity 4 & 5 table.")
-else:
-    tdf = df[cols_needed].copy()
-    tdf["SeverityNum"] = tdf[sev_field].map(_sev_num)
-    tdf = tdf[tdf["SeverityNum"].isin([4, 5])]
+def render_sev45_table(df, scope):
+    if df.empty or not set(cols_needed).issubset(df.columns):
+        print("No data/columns to build Severity 4 & 5 table.")
+        return
+    # Leading severity number for every row in one vectorized regex pass; filter first so the
+    # per-row title wrapping below only runs over the handful of sev 4/5 bugs
+    sev_num = df[sev_field].astype("string").str.extract(SEV_RE, expand=False).astype("Int8")
+    mask = sev_num.isin([4, 5]).fillna(False).astype(bool)
+    tdf = df.loc[mask, cols_needed].assign(SeverityNum=sev_num[mask].astype(int))
 
     if tdf.empty:
         print("No Severity 4 or 5 bugs.")
@@ -358,14 +422,13 @@ else:
         # Labels and formatting
         sev_label = {4: "4 - High", 5: "5 - Critical"}
         tdf["SeverityDisplay"] = tdf["SeverityNum"].map(sev_label)
-        tdf["System.Id"] = tdf["System.Id"].astype(int)
+        tdf["System.Id"] = tdf["System.Id"].astype("int64")
         tdf["TitleWrapped"] = tdf["System.Title"].apply(lambda s: wrap_cell(s, 44, 2))
         tdf = tdf.sort_values(["SeverityNum", "System.Id"], ascending=[False, True])
 
-        rows = tdf.apply(
-            lambda r: [r["System.Id"], r["SeverityDisplay"], r["TitleWrapped"], r["System.State"]],
-            axis=1
-        ).tolist()
+        # Column-wise .tolist() + zip instead of a Python call per row
+        cols = [tdf[c].tolist() for c in ("System.Id", "SeverityDisplay", "TitleWrapped", "System.State")]
+        rows = [list(t) for t in zip(*cols)]
         col_labels = ["Id", "Severity", "Title", "State"]
 
         # Figure (fixed pixels)
@@ -374,11 +437,8 @@ else:
         ax.axis("off")
 
         # Titles
-        now = datetime.now(tz) if tz else datetime.now()
-        today_str = now.strftime("%Y-%m-%d")
-        fig.suptitle(f"Severity 4 & 5 Bug Status as of {today_str}", fontsize=14, y=0.95)
-        fig.text(0.5, 0.90, f"Area Path: {area_path}   |   Iteration Path: {iteration_path}",
-                 ha="center", fontsize=10)
+        fig.suptitle(f"Severity 4 & 5 Bug Status as of {TODAY}", fontsize=14, y=0.95)
+        fig.text(0.5, 0.90, scope, ha="center", fontsize=10)
 
         # Fixed table bbox (percent of figure): tuned to match your sample proportions
         tbl_bbox = [0.08, 0.15, 0.84, 0.68]  # [x, y, w, h]
@@ -433,15 +493,36 @@ else:
                     tbl[(r, c)].set_facecolor("#f7f7f7")
 
         # Footer
-        footer = now.strftime("Generated %Y-%m-%d at %I:%M %p %Z") if tz else \
-                 now.strftime("Generated %Y-%m-%d at %I:%M %p")
-        fig.text(0.99, 0.03, footer, ha="right", fontsize=8)
+        fig.text(0.99, 0.03, FOOTER, ha="right", fontsize=8)
 
-        out_path = "charts/severity_4_5_bug_table.jpg"
+        out_path = CHARTS / "severity_4_5_bug_table.jpg"
         # Keep exact pixel size — no tight/bbox
-        plt.savefig(out_path, dpi=DPI)
+        save_jpeg(fig, out_path, dpi=DPI)
         plt.close(fig)
         print(f"Saved table -> {out_path} ({WIDTH_PX}x{HEIGHT_PX}px, rows={nrows})")
+        return out_path
+
+
+# --- Render all charts from the one fetched DataFrame ---
+def generate(config, df=None):
+    """Fetch the bugs for the .env scope and write the daily charts into CHARTS.
+
+    Pass `df` (from fetch_bugs) to skip the fetch, e.g. when it was run in the background.
+    Returns the paths actually written (a chart with no data is skipped), so callers such as
+    uat_test_report.py can embed them directly."""
+    global _summary_fig
+    if df is None:
+        df = fetch_bugs(config)
+    scope = f"Area Path: {config.area_path}   |   Iteration Path: {config.iteration_path}"
+    written = [render_status(df, scope), render_severity(df, scope)]
+    if _summary_fig is not None:
+        plt.close(_summary_fig)  # done with the shared summary figure
+        _summary_fig = None
+    written.append(render_sev45_table(df, scope))
+    return [p for p in written if p is not None]
+
+if __name__ == "__main__":
+    generate(load_config())
 
 # # === Generate formatted Severity 4 & 5 bug table as a separate JPG ===
 
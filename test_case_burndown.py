@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
-import base64
+import sys
 from urllib.parse import quote
 from typing import Dict, Any, List, Optional
-import requests
-from dotenv import dotenv_values
+from ado_json import jload
+from ado_client import (cfg, fetch_all, SESSION, HTTP_TIMEOUT,
+                        get_json_paginated_fallback, build_top_lookup, points_by_suite)
 import pandas as pd
 
 # ---- .env ----
-cfg = dotenv_values(".env")
 ADO_ORG         = (cfg.get("ADO_ORG") or "").strip()
 ADO_PROJECT     = (cfg.get("ADO_PROJECT") or "").strip()
 ADO_PAT         = (cfg.get("ADO_PAT") or "").strip()
@@ -27,44 +27,15 @@ VER_POINTS  = ["7.1-preview.2", "7.1-preview.1", "7.0", "6.0"]
 VER_RUNS    = ["7.1-preview.7", "7.1-preview.1", "7.0", "6.0"]
 VER_RESULTS = ["7.1-preview.6", "7.1-preview.1", "7.0", "6.0"]
 
-def H():  # headers
-    tok = base64.b64encode(f":{ADO_PAT}".encode()).decode()
-    return {"Authorization": f"Basic {tok}", "Accept": "application/json"}
-
 def urlp(suffix: str) -> str:
     return f"{BASE}/{PROJECT_PATH}{suffix if suffix.startswith('/') else '/'+suffix}"
 
 def get_json(url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    r = requests.get(url, headers=H(), params=params or {})
+    r = SESSION.get(url, params=params or {}, timeout=HTTP_TIMEOUT)
     print(f"GET {r.url}")
     if r.status_code >= 400:
         raise SystemExit(f"{r.status_code} {r.text}")
-    return r.json()
-
-def get_json_paginated_fallback(url: str, versions: List[str], params: Optional[Dict[str, Any]] = None,
-                                value_key: str = "value") -> List[Dict[str, Any]]:
-    last = ""
-    for ver in versions:
-        out: List[Dict[str, Any]] = []
-        token: Optional[str] = None
-        while True:
-            q = dict(params or {})
-            q["api-version"] = ver
-            if token:
-                q["continuationToken"] = token
-            r = requests.get(url, headers=H(), params=q)
-            print(f"GET {r.url}")
-            if r.status_code >= 400:
-                last = f"{r.status_code} {r.text}"
-                out = []
-                break
-            body = r.json()
-            chunk = body.get(value_key, body if isinstance(body, list) else [])
-            out.extend(chunk if isinstance(chunk, list) else [chunk])
-            token = r.headers.get("x-ms-continuationtoken")
-            if not token:
-                return out
-    raise SystemExit(f"All versions failed for {url}\n{last}")
+    return jload(r)
 
 # ---------- Plans & suites ----------
 def resolve_plan_id_by_name(plan_name: str) -> str:
@@ -90,11 +61,16 @@ def list_suites(plan_id: str) -> List[Dict[str, Any]]:
     return suites
 
 # ---------- Points / runs / results ----------
-def get_points_for_suite(plan_id: str, suite_id: str) -> List[Dict[str, Any]]:
+FIELDS_POINTS = ("id", "suite", "testSuite")  # see FIELDS_RESULTS
+
+def get_points_for_suite(plan_id: str, suite_id: str, recursive: bool = False) -> List[Dict[str, Any]]:
+    params = {"planId": plan_id, "suiteId": suite_id}
+    if recursive: params["includeChildSuites"] = "true"
     pts = get_json_paginated_fallback(
         urlp("/_apis/test/points"), VER_POINTS,
-        params={"planId": plan_id, "suiteId": suite_id}, value_key="value"
+        params=params, value_key="value"
     )
+    pts = [{k: p[k] for k in FIELDS_POINTS if k in p} for p in pts]
     for p in pts:
         if "id" in p: p["id"] = int(p["id"])
     return pts
@@ -108,15 +84,27 @@ def list_runs_for_plan(plan_id: str, start: str, end: str) -> List[Dict[str, Any
     print(f"[OK] {len(runs)} run(s) for plan {plan_id}")
     return runs
 
+# ADO's results/points list APIs have no field projection ($select is ignored), so records are
+# trimmed to what the report reads as they arrive; the rest (_links, build, release, ...) is dropped.
+FIELDS_RESULTS = ("id", "outcome", "state", "testCase", "testCaseTitle", "testPoint", "pointId",
+                  "startedDate", "completedDate", "durationInMs", "owner", "configuration", "priority", "area")
+INTERN_FIELDS = ("outcome", "state", "area", "priority")
+
 def list_results_for_run(run_id: int) -> List[Dict[str, Any]]:
     results = get_json_paginated_fallback(urlp(f"/_apis/test/Runs/{run_id}/results"),
-                                          VER_RESULTS, params={})
+                                          VER_RESULTS, params={}, stream=True)
+    results = [{k: raw[k] for k in FIELDS_RESULTS if k in raw} for raw in results]
     for r in results:
         if "id" in r: r["id"] = int(r["id"])
         if "testPoint" in r and isinstance(r["testPoint"], dict) and "id" in r["testPoint"]:
             r["pointId"] = int(r["testPoint"]["id"])
         elif "pointId" in r and r["pointId"] is not None:
             r["pointId"] = int(r["pointId"])
+        # a handful of distinct values repeated across thousands of rows: share one str each
+        for k in INTERN_FIELDS:
+            v = r.get(k)
+            if isinstance(v, str):
+                r[k] = sys.intern(v)
     return results
 
 # ---------- Orchestration ----------
@@ -129,22 +117,19 @@ def main():
     top_level = [s for s in suites if s.get("parentId") is None]
     print("[OK] Top-level suites:", ", ".join(s["name"] for s in top_level))
 
-    # For every suite, compute its top-level ancestor
-    def top_ancestor(sid: str) -> str:
-        cur = by_id[sid]
-        while cur.get("parentId") is not None:
-            cur = by_id[cur["parentId"]]
-        return cur["id"]
+    # For every suite, compute its top-level ancestor (one path-compressed pass)
+    top_of = build_top_lookup(suites)
 
     # Collect point -> top-level suite mapping (aggregate descendants up)
     top_points: Dict[str, List[int]] = {s["id"]: [] for s in top_level}
     point_to_top: Dict[int, str] = {}
+    own_points = points_by_suite(plan_id, suites, get_points_for_suite)
     for s in suites:
         sid = s["id"]
-        pts = get_points_for_suite(plan_id, sid)
+        pts = own_points[sid]
         pids = [p["id"] for p in pts if "id" in p]
         if not pids: continue
-        tid = top_ancestor(sid)
+        tid = top_of[sid]
         top_points[tid].extend(pids)
         for pid in pids: point_to_top[pid] = tid
         print(f"  - Suite '{s['name']}' (ID={sid}) contributes {len(pids)} points to top '{by_id[tid]['name']}'")
@@ -154,9 +139,10 @@ def main():
 
     # Gather results per top-level suite
     results_by_top: Dict[str, List[Dict[str, Any]]] = {s["id"]: [] for s in top_level}
-    for run in runs:
+    results_per_run = fetch_all(list_results_for_run, [run["id"] for run in runs], "results for run")
+    for run, run_results in zip(runs, results_per_run):
         rid = run["id"]
-        for res in list_results_for_run(rid):
+        for res in run_results:
             pid = res.get("pointId")
             if pid is None: continue
             tid = point_to_top.get(pid)
@@ -168,30 +154,33 @@ def main():
             res["_automated"] = run.get("isAutomated")
             results_by_top[tid].append(res)
 
-    # Build 1 DataFrame per top-level suite
+    # Build 1 DataFrame per top-level suite. json_normalize flattens the nested refs
+    # (testCase/owner/configuration/area) in one pass; the ones we keep are renamed below.
+    nested = {
+        "testCase.id": "testCaseId", "testCase.name": "testCaseName",
+        "configuration.name": "configurationName", "owner.displayName": "ownerName",
+        "area.name": "areaName",
+    }
     wanted = [
         "_planId", "_topSuiteId", "_runId", "_runName",
         "id", "outcome", "state",
-        "testCase", "testCaseTitle",
-        "testPoint", "pointId",
+        "testCaseId", "testCaseName", "testCaseTitle",
+        "pointId",
         "startedDate", "completedDate",
         "durationInMs", "_automated",
-        "owner", "area", "configuration", "priority"
+        "ownerName", "areaName", "configurationName", "priority"
     ]
+    # low-cardinality text columns; category stores them as small int codes
+    category_cols = ("outcome", "state", "_runName", "ownerName", "areaName", "configurationName")
     name_by_id = {s["id"]: s["name"] for s in top_level}
     dfs: Dict[str, pd.DataFrame] = {}
 
     for tid, rows in results_by_top.items():
-        df = pd.DataFrame(rows)
-        if "testCase" in df.columns:
-            df["testCaseId"] = df["testCase"].apply(lambda x: (x or {}).get("id") if isinstance(x, dict) else None)
-            df["testCaseName"] = df["testCase"].apply(lambda x: (x or {}).get("name") if isinstance(x, dict) else None)
-        if "configuration" in df.columns:
-            df["configurationName"] = df["configuration"].apply(lambda x: (x or {}).get("name") if isinstance(x, dict) else None)
-        if "owner" in df.columns:
-            df["ownerName"] = df["owner"].apply(lambda x: (x or {}).get("displayName") if isinstance(x, dict) else None)
-        cols = [c for c in wanted + ["testCaseId","testCaseName","configurationName","ownerName"] if c in df.columns]
+        df = pd.json_normalize(rows, max_level=1).rename(columns=nested)
+        cols = [c for c in wanted if c in df.columns]
         if cols: df = df[cols]
+        cat_cols = [c for c in category_cols if c in df.columns]
+        if cat_cols: df = df.astype(dict.fromkeys(cat_cols, "category"))
         dfs[tid] = df
         print(f"[DF] {name_by_id[tid]}: {len(df)} rows")
         # Optional save:
@@ -16,15 +16,16 @@ Optional:
   OUTPUT_DIR   (default: exports)
 """
 
-import base64, os
+import csv, os, re, sys
+from datetime import datetime, timezone
+from functools import lru_cache
 from urllib.parse import quote
-from typing import Dict, Any, List, Optional, Set
-import requests
-from dotenv import dotenv_values
-import pandas as pd
+from typing import Dict, Any, List, Optional, Set, Tuple
+from ado_json import jload
+from ado_client import (cfg, CONCURRENCY, fetch_all, SESSION, HTTP_TIMEOUT,
+                        get_json_paginated_fallback, build_top_lookup, points_by_suite)
 
 # ------------- .env -------------
-cfg = dotenv_values(".env")
 ADO_ORG        = (cfg.get("ADO_ORG") or "").strip()
 ADO_PROJECT    = (cfg.get("ADO_PROJECT") or "").strip()
 ADO_PAT        = (cfg.get("ADO_PAT") or "").strip()
@@ -44,44 +45,15 @@ VER_POINTS       = ["7.1-preview.2", "7.1-preview.1", "7.0", "6.0"]  # fallback
 VER_RUNS         = ["7.1-preview.7", "7.1-preview.1", "7.0", "6.0"]  # fallback for runs
 VER_RESULTS      = ["7.1-preview.6", "7.1-preview.1", "7.0", "6.0"]  # fallback for results
 
-def H() -> Dict[str,str]:
-    tok = base64.b64encode(f":{ADO_PAT}".encode()).decode()
-    return {"Authorization": f"Basic {tok}", "Accept": "application/json"}
-
 def urlp(suffix: str) -> str:
     return f"{BASE}/{PROJECT_PATH}{suffix if suffix.startswith('/') else '/'+suffix}"
 
 def get_json(url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    r = requests.get(url, headers=H(), params=params or {})
+    r = SESSION.get(url, params=params or {}, timeout=HTTP_TIMEOUT)
     print(f"GET {r.url}")
     if r.status_code >= 400:
         raise SystemExit(f"HTTP {r.status_code} for GET {r.url}\n{r.text}")
-    return r.json()
-
-def get_json_paginated_fallback(url: str, versions: List[str], params: Optional[Dict[str, Any]] = None,
-                                value_key: str = "value") -> List[Dict[str, Any]]:
-    last = ""
-    for ver in versions:
-        out: List[Dict[str, Any]] = []
-        token: Optional[str] = None
-        while True:
-            q = dict(params or {})
-            q["api-version"] = ver
-            if token:
-                q["continuationToken"] = token
-            r = requests.get(url, headers=H(), params=q)
-            print(f"GET {r.url}")
-            if r.status_code >= 400:
-                last = f"{r.status_code} {r.text}"
-                out = []
-                break
-            body = r.json()
-            chunk = body.get(value_key, body if isinstance(body, list) else [])
-            out.extend(chunk if isinstance(chunk, list) else [chunk])
-            token = r.headers.get("x-ms-continuationtoken")
-            if not token:
-                return out
-    raise SystemExit(f"All versions failed for {url}\n{last}")
+    return jload(r)
 
 # ------------- Plans & Suites -------------
 def resolve_plan_id_by_name(plan_name: str) -> str:
@@ -111,33 +83,43 @@ def build_suite_path_lookup(suites: List[Dict[str, Any]]) -> Dict[str, str]:
     by_id = {s["id"]: s for s in suites}
     cache: Dict[str, str] = {}
     def path_for(sid: str) -> str:
-        if sid in cache:
-            return cache[sid]
-        parts = []
-        cur = by_id[sid]
-        while cur is not None:
-            parts.append(cur["name"])
+        # climb only until an already-resolved ancestor, then fill the cache back down
+        chain = []
+        cur = by_id.get(sid)
+        while cur is not None and cur["id"] not in cache:
+            chain.append(cur)
             pid = cur.get("parentId")
             cur = by_id.get(pid) if pid is not None else None
-        parts.reverse()
-        cache[sid] = "/".join(parts)
+        prefix = cache[cur["id"]] if cur is not None else ""
+        for node in reversed(chain):
+            prefix = f"{prefix}/{node['name']}" if prefix else node["name"]
+            cache[node["id"]] = prefix
         return cache[sid]
     for s in suites:
         _ = path_for(s["id"])
     return cache
 
 # ------------- Points (latest outcomes) -------------
-def get_points_for_suite(plan_id: str, suite_id: str) -> List[Dict[str, Any]]:
+FIELDS_POINTS = ("id", "testCase", "outcome", "resolvedOutcome", "suite", "testSuite")
+
+@lru_cache(maxsize=None)
+def get_points_for_suite(plan_id: str, suite_id: str, recursive: bool = False) -> List[Dict[str, Any]]:
+    params = {"planId": plan_id, "suiteId": suite_id, "includePointDetails": "true", "returnIdentityRef": "true"}
+    if recursive:
+        params["includeChildSuites"] = "true"
     pts = get_json_paginated_fallback(
         urlp("/_apis/test/points"),
         VER_POINTS,
-        params={"planId": plan_id, "suiteId": suite_id, "includePointDetails": "true", "returnIdentityRef": "true"},
+        params=params,
         value_key="value"
     )
+    out = []
     for p in pts:
         if "id" in p: p["id"] = int(p["id"])
         p["resolvedOutcome"] = resolve_point_outcome(p)
-    return pts
+        # keep only what the aggregation reads (the point details are large and stay cached)
+        out.append({k: p[k] for k in FIELDS_POINTS if k in p})
+    return out
 
 # ------------- Outcome precedence & util -------------
 OUTCOME_ORDER = {
@@ -149,6 +131,10 @@ OUTCOME_ORDER = {
     "Passed": 0,
     None: -1, "": -1, "None": -1, "NeverRun": -1
 }
+# Aggregation keeps only the winning rank; every outcome not listed above ranks -1 and
+# never displaces the initial None, so -1 always reports as NeverRun.
+WORST_RANK = max(OUTCOME_ORDER.values())  # Failed
+RANK_TO_NAME = {**{r: n for n, r in OUTCOME_ORDER.items() if isinstance(n, str) and n}, -1: "NeverRun"}
 
 
 def resolve_point_outcome(point: dict):
@@ -179,18 +165,14 @@ def resolve_point_outcome(point: dict):
     return lrd.get("outcome")
 
 
-def worse(a: Optional[str], b: Optional[str]) -> Optional[str]:
-    """Return the worse (higher precedence value) of two outcomes."""
-    va = OUTCOME_ORDER.get(a, -1)
-    vb = OUTCOME_ORDER.get(b, -1)
-    return a if va >= vb else b
+_SLUG_STRIP = re.compile(r"[^\w\s-]")
+_SLUG_COLLAPSE = re.compile(r"[\s-]+")
 
 def slugify(name: str, maxlen: int = 80) -> str:
-    import re
     s = name.strip().lower().replace("&", "and")
-    s = re.sub(r"[^\w\s-]", "", s)
-    s = re.sub(r"[\s-]+", "_", s).strip("_")
-    return s[:maxlen] if len(s) > maxlen else s
+    s = _SLUG_STRIP.sub("", s)
+    s = _SLUG_COLLAPSE.sub("_", s).strip("_")
+    return s[:maxlen]
 
 
 # ------------- Runs & Results (for backfilling outcomes) -------------
@@ -208,9 +190,26 @@ def list_runs_for_plan(plan_id: str) -> List[Dict[str, Any]]:
         pass
     return runs
 
+_TS_FRACTION = re.compile(r"\.(\d{1,3})")
+
+def epoch_ms(ts: Optional[str]) -> int:
+    """ADO UTC timestamp ('2024-05-01T12:34:56.1234567Z', 0-7 fraction digits) -> epoch ms; 0 if missing."""
+    if not ts:
+        return 0
+    secs = int(datetime.fromisoformat(ts[:19]).replace(tzinfo=timezone.utc).timestamp())
+    m = _TS_FRACTION.match(ts, 19)
+    return secs * 1000 + (int(m.group(1).ljust(3, "0")) if m else 0)
+
+# ADO's results/points list APIs have no field projection ($select is ignored), so records are
+# trimmed to what the report reads as they arrive; the rest (_links, build, release, ...) is dropped.
+FIELDS_RESULTS = ("id", "outcome", "state", "testCase", "testCaseTitle", "testPoint", "pointId",
+                  "startedDate", "completedDate", "durationInMs", "owner", "configuration", "priority", "area")
+INTERN_FIELDS = ("outcome", "state", "area", "priority")
+
 def list_results_for_run(run_id: int) -> List[Dict[str, Any]]:
     results = get_json_paginated_fallback(urlp(f"/_apis/test/Runs/{run_id}/results"),
-                                          VER_RESULTS, params={})
+                                          VER_RESULTS, params={}, stream=True)
+    results = [{k: raw[k] for k in FIELDS_RESULTS if k in raw} for raw in results]
     for r in results:
         if "id" in r:
             r["id"] = int(r["id"])
@@ -222,8 +221,30 @@ def list_results_for_run(run_id: int) -> List[Dict[str, Any]]:
                 r["pointId"] = int(r["pointId"])
             except Exception:
                 pass
+        # a handful of distinct values repeated across thousands of rows: share one str each
+        for k in INTERN_FIELDS:
+            v = r.get(k)
+            if isinstance(v, str):
+                r[k] = sys.intern(v)
     return results
 # ------------- Orchestration -------------
+CSV_HEADER = ("TopSuiteId", "TopSuiteName", "TestCaseId", "TestCaseName", "Outcome", "NumPaths", "Paths")
+
+def emit_top_csv(tid: str, tname: str, bucket: Dict[int, List[Any]], out_path: str, combined) -> int:
+    """Write one top-level suite's CSV from its agg bucket, and the same rows minus TopSuiteId
+    to the `combined` csv writer in the same pass. Returns the row count."""
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(CSV_HEADER)
+        for tcid, (name, rank, paths) in bucket.items():
+            paths = set(paths)
+            row = (tid, tname, tcid, name, RANK_TO_NAME[rank], len(paths), "; ".join(sorted(paths)))
+            w.writerow(row)
+            combined.writerow(row[1:])
+    return len(bucket)
+
+BACKFILL_STALE_RUNS = 3  # consecutive recent runs with no new point before the backfill scan stops
+
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -232,22 +253,38 @@ def main():
     by_id = {s["id"]: s for s in suites}
     top_level = [s for s in suites if s.get("parentId") is None]
     suite_path = build_suite_path_lookup(suites)
+    top_of = build_top_lookup(suites)
+    own_points = points_by_suite(plan_id, suites, get_points_for_suite)
+    all_points = {p["id"] for pts in own_points.values() for p in pts if "id" in p}
     # Build a backfill map of latest outcomes by pointId using runs/results
-    latest_by_point: Dict[int, Dict[str, Any]] = {}
+    latest_by_point: Dict[int, Tuple[int, Optional[str]]] = {}  # pointId -> (epoch ms, outcome)
     try:
         runs = list_runs_for_plan(plan_id)
-        # To keep it fast, look at most recent ~50 runs
-        for run in runs[:50]:
-            rid = run["id"]
-            for res in list_results_for_run(rid):
-                pid = res.get("pointId")
-                if pid is None:
-                    continue
-                ts = res.get("completedDate") or res.get("startedDate") or run.get("lastUpdatedDate")
-                # keep the latest by timestamp
-                prev = latest_by_point.get(pid)
-                if prev is None or (ts or "") > (prev.get("ts") or ""):
-                    latest_by_point[pid] = {"outcome": res.get("outcome"), "ts": ts}
+        # To keep it fast, look at most recent ~50 runs, a pool-width at a time (newest first),
+        # and stop once every point has a result or BACKFILL_STALE_RUNS runs in a row add none.
+        recent = runs[:50]
+        stale = 0
+        for i in range(0, len(recent), CONCURRENCY):
+            batch = recent[i:i + CONCURRENCY]
+            for run, run_results in zip(batch, fetch_all(list_results_for_run, [r["id"] for r in batch], "results for run")):
+                added = 0
+                for res in run_results:
+                    pid = res.get("pointId")
+                    if pid is None:
+                        continue
+                    ep = epoch_ms(res.get("completedDate") or res.get("startedDate") or run.get("lastUpdatedDate"))
+                    # keep the latest by timestamp
+                    prev = latest_by_point.get(pid)
+                    if prev is None:
+                        added += 1
+                    if prev is None or ep > prev[0]:
+                        latest_by_point[pid] = (ep, res.get("outcome"))
+                stale = 0 if added else stale + 1
+                if stale >= BACKFILL_STALE_RUNS or latest_by_point.keys() >= all_points:
+                    break
+            else:
+                continue
+            break
         print(f"[OK] Backfill map prepared for {len(latest_by_point)} point(s) from recent runs")
     except SystemExit as e:
         # If runs/results APIs are blocked, continue without backfill
@@ -257,22 +294,17 @@ def main():
 
     print("[OK] Top-level suites:", ", ".join(s["name"] for s in top_level))
 
-    def top_ancestor(sid: str) -> str:
-        cur = by_id[sid]
-        while cur.get("parentId") is not None:
-            cur = by_id[cur["parentId"]]
-        return cur["id"]
-
     # For each top-level suite, aggregate UNIQUE test cases
-    # Structure: {topId: {testCaseId: {"name":..., "outcome":..., "paths": set()}}}
-    agg: Dict[str, Dict[int, Dict[str, Any]]] = {s["id"]: {} for s in top_level}
+    # Structure: {topId: {testCaseId: [name, outcome rank, [paths...]]}} (paths deduped at output)
+    agg: Dict[str, Dict[int, List[Any]]] = {s["id"]: {} for s in top_level}
 
     for s in suites:
         sid = s["id"]
-        pts = get_points_for_suite(plan_id, sid)
+        pts = own_points[sid]
         if not pts:
             continue
-        tid = top_ancestor(sid)
+        tid = top_of[sid]
+        bucket = agg[tid]
         tname = by_id[tid]["name"]
         path_str = suite_path.get(sid, s["name"])
 
@@ -280,58 +312,39 @@ def main():
             tc = p.get("testCase") or {}
             tcid = tc.get("id")
             tcname = tc.get("name")
-            outcome = (p.get("resolvedOutcome") or p.get("outcome") or "NeverRun")
+            outcome = sys.intern(p.get("resolvedOutcome") or p.get("outcome") or "NeverRun")
 
             if not tcid:
                 continue
-            bucket = agg[tid].setdefault(int(tcid), {"name": tcname, "outcome": None, "paths": set()})
-            bucket["name"] = bucket["name"] or tcname
-            bucket["outcome"] = worse(bucket["outcome"], outcome)
-            bucket["paths"].add(path_str)
-
-    # Build exactly one CSV per top-level suite
-    for top in top_level:
-        tid = top["id"]
-        tname = top["name"]
-        rows = []
-        for tcid, info in agg[tid].items():
-            rows.append({
-                "TopSuiteId": tid,
-                "TopSuiteName": tname,
-                "TestCaseId": tcid,
-                "TestCaseName": info["name"],
-                "Outcome": (info["outcome"] if info["outcome"] not in (None, "", "None") else "NeverRun"),
-                "Paths": "; ".join(sorted(info["paths"])),
-                "NumPaths": len(info["paths"]),
-            })
-        df = pd.DataFrame(rows, columns=[
-            "TopSuiteId","TopSuiteName","TestCaseId","TestCaseName","Outcome","NumPaths","Paths"
-        ])
-        safe = slugify(tname)
-        out_path = os.path.join(OUTPUT_DIR, f"{safe}_testcases.csv")
-        df.to_csv(out_path, index=False)
-        print(f"[CSV] {tname} -> {out_path} ({len(df)} unique test case rows)")
-
-    # Optional combined
-    combined = []
-    for top in top_level:
-        tid = top["id"]
-        tname = top["name"]
-        # reconstruct per-top CSV rows from agg
-        for tcid, info in agg[tid].items():
-            combined.append({
-                "TopSuiteName": tname,
-                "TestCaseId": tcid,
-                "TestCaseName": info["name"],
-                "Outcome": (info["outcome"] if info["outcome"] not in (None, "", "None") else "NeverRun"),
-                "NumPaths": len(info["paths"]),
-                "Paths": "; ".join(sorted(info["paths"])),
-            })
-    if combined:
-        all_df = pd.DataFrame(combined)
-        all_out = os.path.join(OUTPUT_DIR, "all_top_level_testcases.csv")
-        all_df.to_csv(all_out, index=False)
-        print(f"[CSV] Combined -> {all_out} ({len(all_df)} rows)")
+            tcid = int(tcid)
+            entry = bucket.get(tcid)
+            if entry is None:
+                bucket[tcid] = [tcname, OUTCOME_ORDER.get(outcome, -1), [path_str]]
+                continue
+            if not entry[0]:
+                entry[0] = tcname
+            if entry[1] != WORST_RANK:  # nothing outranks Failed; only the path matters then
+                rank = OUTCOME_ORDER.get(outcome, -1)
+                if rank > entry[1]:
+                    entry[1] = rank
+            entry[2].append(path_str)
+
+    # Build exactly one CSV per top-level suite; every row also goes to the combined CSV
+    # (the same rows, minus TopSuiteId) in the same pass, so each row is formatted once
+    all_out = os.path.join(OUTPUT_DIR, "all_top_level_testcases.csv")
+    combined_count = 0
+    with open(all_out, "w", newline="", encoding="utf-8") as f:
+        combined = csv.writer(f, lineterminator="\n")
+        combined.writerow(CSV_HEADER[1:])
+        for t in top_level:
+            out_path = os.path.join(OUTPUT_DIR, f"{slugify(t['name'])}_testcases.csv")
+            count = emit_top_csv(t["id"], t["name"], agg[t["id"]], out_path, combined)
+            print(f"[CSV] {t['name']} -> {out_path} ({count} unique test case rows)")
+            combined_count += count
+    if combined_count:
+        print(f"[CSV] Combined -> {all_out} ({combined_count} rows)")
+    else:
+        os.remove(all_out)  # the combined file is optional: only kept when there are rows
 
 if __name__ == "__main__":
     main()
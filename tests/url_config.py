@@ -9,4 +9,5 @@ ADO_PROJECT = os.getenv("ADO_PROJECT")
 
 #URLs
 def base_url(): return f"https://dev.azure.com/{ADO_ORG}/_apis/projects?api-version=6.0"
-def wiql_url(): return f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/wiql?api-version=6.0"
\ No newline at end of file
+def wiql_url(): return f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/wiql?api-version=6.0"
+def workitemsbatch_url(): return f"https://dev.azure.com/{ADO_ORG}/{ADO_PROJECT}/_apis/wit/workitemsbatch?api-version=7.1-preview.1"
\ No newline at end of file
@@ -1,5 +1,7 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,7 +11,12 @@ api_version = "6.0"
 
 url = f"https://dev.azure.com/{org}/_apis/projects?api-version={api_version}"
 
-response = requests.get(url, auth=("", pat), allow_redirects=False)
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"], raise_on_status=False),
+))
+response = session.get(url, auth=("", pat), allow_redirects=False, timeout=(5, 30))
 
 print(f"Status Code: {response.status_code}")
 print(f"Redirect Location: {response.headers.get('Location')}")
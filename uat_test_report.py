@@ -2,16 +2,13 @@ from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime
-import pytz
-from dotenv import dotenv_values
+from config import load_config
 
-# Load .env
-env_path = ".env"
-config = dotenv_values(env_path)
-area_path = config["AREA_PATH"]
-iteration_path = config["ITERATION_PATH"]
-project = config["ADO_PROJECT"]
-end_date = config["END_DATE"]
+# Load .env once; the same ReportConfig is handed to both chart generators below
+config = load_config()
+area_path = config.area_path
+iteration_path = config.iteration_path
+project = config.project
 
 doc = Document()
 from docx.shared import Inches
@@ -20,8 +17,9 @@ from zoneinfo import ZoneInfo
 from datetime import datetime
 
 # Convert END_DATE string to datetime and format for EST
-end_date_dt = datetime.strptime(end_date, "%Y-%m-%d")
-end_date_est = end_date_dt.astimezone(ZoneInfo("America/New_York")).strftime("%B %d, %Y")
+# (attach the zone rather than astimezone(), which would treat the naive date as machine-local)
+EST = ZoneInfo("America/New_York")
+end_date_est = config.end_date.replace(tzinfo=EST).strftime("%B %d, %Y")
 
 # Access header
 section = doc.sections[0]
@@ -75,8 +73,7 @@ run.font.size = Pt(24)
 para.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
 # Add EST date-time stamp
-est = pytz.timezone("US/Eastern")
-timestamp = datetime.now(est).strftime("%B %d, %Y %I:%M %p EST")
+timestamp = datetime.now(EST).strftime("%B %d, %Y %I:%M %p EST")
 
 ts_para = doc.add_paragraph()
 ts_run = ts_para.add_run(timestamp)
@@ -92,60 +89,29 @@ info_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
 ##### TOTAL BUG BURN DOWN CHART #####
 
-import subprocess
-from docx.shared import Inches
-import time
-import os
-
-# Step 1: Run the script to generate the chart
-subprocess.run(["python", "total_bug_burndown.py"], check=True)
-
-# Step 2: Wait for file to exist (or retry briefly)
-chart_path = "charts/burndown_chart.jpg"
-for _ in range(10):  # wait up to ~5 seconds
-    if os.path.exists(chart_path):
-        break
-    time.sleep(0.5)
-else:
-    raise FileNotFoundError(f"Expected chart not found at {chart_path}")
-
-# Step 3: Insert image into the doc
-chart_para = doc.add_paragraph()
-run = chart_para.add_run()
-run.add_picture(chart_path, width=Inches(6.0))  # adjust width if needed
-chart_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+from concurrent.futures import ThreadPoolExecutor
+from total_bug_burndown import generate_burndown
+import daily_bug_report
+
+# The two reports query ADO independently, so fetch the daily-report bugs in the background
+# while the burndown runs. Plotting stays on this thread (pyplot is not thread-safe).
+with ThreadPoolExecutor(max_workers=1) as pool:
+    daily_bugs = pool.submit(daily_bug_report.fetch_bugs, config)
+
+    # Build the chart in-process and embed the path it reports (None when no bugs match)
+    chart_path = generate_burndown(config)
+    daily_df = daily_bugs.result()
+if chart_path:
+    chart_para = doc.add_paragraph()
+    run = chart_para.add_run()
+    run.add_picture(chart_path, width=Inches(6.0))  # adjust width if needed
+    chart_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
 #### Bug report chart #####
 
-# Step: Run daily_bug_report.py to generate latest charts
-import subprocess, os, time
-subprocess.run(['python', 'daily_bug_report.py'], check=True)
-
-# Step: Insert status_summary.jpg into the document when ready
-status_chart = 'charts/status_summary.jpg'
-for _ in range(20):  # wait up to 10 seconds
-    if os.path.exists(status_chart):
-        doc.add_picture(status_chart, width=Inches(6))
-        last_paragraph = doc.paragraphs[-1]
-        last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        break
-    time.sleep(0.5)
-
-# Step: Insert severity_summary.jpg into the document when ready
-severity_chart = 'charts/severity_summary.jpg'
-for _ in range(20):  # wait up to 10 seconds
-    if os.path.exists(severity_chart):
-        doc.add_picture(severity_chart, width=Inches(6))
-        last_paragraph = doc.paragraphs[-1]
-        last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        break
-    time.sleep(0.5)
-
-# Step: Optionally insert severity_4_5_bug_table_final.jpg
-bug_table = 'charts/severity_4_5_bug_table.jpg'
-time.sleep(2)  # allow time to generate
-if os.path.exists(bug_table):
-    doc.add_picture(bug_table, width=Inches(6))
+# Status summary, severity summary and the optional Sev 4/5 table, in that order
+for bug_chart in daily_bug_report.generate(config, daily_df):
+    doc.add_picture(str(bug_chart), width=Inches(6))
     last_paragraph = doc.paragraphs[-1]
     last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
 